@@ -1,10 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from fastapi.responses import StreamingResponse
+from transformers import StoppingCriteria, StoppingCriteriaList, TextStreamer
 import torch
+import asyncio
+import json
 import os
+import threading
+import time
+from typing import Optional
 from pydantic import BaseModel
 
+from answer_cache import ANSWER_CACHE, AnswerCache
+from inference_backends import CHAT_BACKEND, load_chat_model
+from inference_worker import BatchingWorker
+from prefix_cache import PrefixCache
+
 app = FastAPI(title="FloatChat AI Chatbot Server")
 
 # CORS middleware
@@ -19,6 +30,31 @@ app.add_middleware(
 # Global model and tokenizer
 model = None
 tokenizer = None
+backend = None
+
+# Concurrent /chat requests are grouped into padded batches by a background worker
+CHAT_MAX_BATCH_SIZE = int(os.getenv("CHAT_MAX_BATCH_SIZE", "8"))
+CHAT_MAX_WAIT_MS = float(os.getenv("CHAT_MAX_WAIT_MS", "20"))
+worker = None
+
+# /chat/stream generates one answer per request, each on its own thread
+CHAT_MAX_STREAMS = int(os.getenv("CHAT_MAX_STREAMS", "4"))
+stream_slots = asyncio.Semaphore(CHAT_MAX_STREAMS)
+stream_stats = {"streams": 0, "completed": 0, "cancelled": 0, "failed": 0, "tokens": 0, "ttft_seconds": 0.0, "generate_seconds": 0.0}
+
+MAX_NEW_TOKENS = 60
+
+SYSTEM_PROMPT = "System: You are an oceanographic data expert that provides accurate information about ocean measurements."
+
+# KV state of SYSTEM_PROMPT, computed once at startup and reused by every generation
+CHAT_PREFIX_CACHE = os.getenv("CHAT_PREFIX_CACHE", "1") != "0"
+prefix_cache = None
+
+# Answers to questions asked before, matched exactly or by embedding similarity
+answer_cache = AnswerCache() if ANSWER_CACHE else None
+
+NOT_LOADED_ANSWER = "AI model is not loaded yet. Please try again in a moment."
+ERROR_ANSWER = "Sorry, I encountered an error processing your question"
 
 class ChatRequest(BaseModel):
     question: str
@@ -28,72 +64,208 @@ class ChatResponse(BaseModel):
     answer: str
     model_type: str
     confidence: str
+    cache: Optional[str] = None
 
 @app.on_event("startup")
 async def load_model():
-    global model, tokenizer
+    global model, tokenizer, backend, prefix_cache, worker
     
-    print("🔄 Loading your fine-tuned ocean chatbot...")
+    print(f"🔄 Loading your fine-tuned ocean chatbot ({CHAT_BACKEND})...")
     
     # Optimize for CPU
     torch.set_num_threads(min(8, os.cpu_count()))
     
     try:
-        model = AutoModelForCausalLM.from_pretrained(
-            "./ocean_chatbot_final",
-            dtype=torch.float32,
-            device_map="cpu",
-            low_cpu_mem_usage=True
-        )
-        
-        tokenizer = AutoTokenizer.from_pretrained("./ocean_chatbot_final")
-        
-        if tokenizer.pad_token is None or tokenizer.pad_token == tokenizer.eos_token:
-            tokenizer.add_special_tokens({"pad_token": "[PAD]"})
-            model.resize_token_embeddings(len(tokenizer))
-            
-        print("✅ Ocean chatbot loaded successfully!")
+        model, tokenizer, backend = load_chat_model("./ocean_chatbot_final", CHAT_BACKEND)
+
+        print(f"✅ Ocean chatbot loaded successfully! (backend: {backend})")
+
+        if CHAT_PREFIX_CACHE:
+            prefix_cache = PrefixCache(model, tokenizer, SYSTEM_PROMPT)
+            if prefix_cache.enabled:
+                print(f"✅ System prompt cached ({prefix_cache.length} tokens; prefill saved: {prefix_cache.saved_single * 1000:.1f} ms alone, {prefix_cache.saved_per_batched_row * 1000:.1f} ms per batched answer)")
+            else:
+                print(f"⚠️ System prompt not cached: {prefix_cache.disabled_reason}")
         
     except Exception as e:
         print(f"❌ Error loading model: {str(e)}")
         raise
 
-def ask_ocean_question(question: str) -> str:
+    worker = BatchingWorker(answer_batch, max_batch_size=CHAT_MAX_BATCH_SIZE, max_wait_ms=CHAT_MAX_WAIT_MS).start()
+
+@app.on_event("shutdown")
+async def stop_worker():
+    if worker is not None:
+        worker.stop()
+
+def build_prompt(question: str) -> str:
+    return SYSTEM_PROMPT + build_turn(question)
+
+def build_turn(question: str) -> str:
+    return f"\nUser: {question}\nBot:"
+
+def encode_prompts(questions: list) -> dict:
+    """generate() inputs for the questions, starting from the cached system prompt when there is one."""
+    if prefix_cache is not None and prefix_cache.use_for(len(questions)):
+        input_ids, attention_mask, past_key_values = prefix_cache.prepare([build_turn(question) for question in questions])
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "past_key_values": past_key_values}
+
+    encoded = tokenizer(
+        [build_prompt(question) for question in questions],
+        return_tensors="pt",
+        padding=True,
+        truncation=True,
+        max_length=256
+    )
+    return {"input_ids": encoded["input_ids"], "attention_mask": encoded["attention_mask"]}
+
+def extract_answer(decoded: str) -> str:
+    if "Bot:" in decoded:
+        return decoded.split("Bot:")[-1].strip()
+    else:
+        return "I need more specific ocean data to answer that question."
+
+def answer_batch(questions: list) -> list:
+    """Answer several questions with one padded generate call (one answer per question)."""
     global model, tokenizer
     
     if model is None or tokenizer is None:
-        return "AI model is not loaded yet. Please try again in a moment."
-    
-    prompt = f"System: You are an oceanographic data expert that provides accurate information about ocean measurements.\nUser: {question}\nBot:"
+        return [NOT_LOADED_ANSWER] * len(questions)
 
     try:
-        encoded = tokenizer(
-            prompt,
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=256
-        )
-
         with torch.no_grad():
             outputs = model.generate(
-                encoded["input_ids"],
-                attention_mask=encoded["attention_mask"],
-                max_new_tokens=60,
+                **encode_prompts(questions),
+                max_new_tokens=MAX_NEW_TOKENS,
                 do_sample=False,
                 pad_token_id=tokenizer.pad_token_id,
                 eos_token_id=tokenizer.eos_token_id,
             )
 
-        decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        if "Bot:" in decoded:
-            return decoded.split("Bot:")[-1].strip()
-        else:
-            return "I need more specific ocean data to answer that question."
+        decoded = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        return [extract_answer(text) for text in decoded]
             
     except Exception as e:
-        return f"Sorry, I encountered an error processing your question: {str(e)}"
+        return [f"{ERROR_ANSWER}: {str(e)}"] * len(questions)
+
+def ask_ocean_question(question: str) -> str:
+    return answer_batch([question])[0]
+
+def remember_answer(question: str, answer: str):
+    if answer_cache is not None and answer != NOT_LOADED_ANSWER and not answer.startswith(ERROR_ANSWER):
+        answer_cache.put(question, answer)
+
+class TokenStreamer(TextStreamer):
+    """Passes decoded text from the generate thread to an asyncio queue, timing the first token."""
+
+    def __init__(self, tokenizer, loop):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.tokens = 0
+        self.first_token_at = None
+
+    def put(self, value):
+        if not self.next_tokens_are_prompt:
+            self.tokens += value.numel()
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+        super().put(value)
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+    def finish(self, error=None):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, error or StopIteration)
+
+class CancelledCriteria(StoppingCriteria):
+    """Stops generate as soon as the client has gone away."""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool)
+
+def generate_streaming(question: str, streamer: TokenStreamer, cancelled: threading.Event):
+    try:
+        with torch.no_grad():
+            model.generate(
+                **encode_prompts([question]),
+                max_new_tokens=MAX_NEW_TOKENS,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id,
+                eos_token_id=tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([CancelledCriteria(cancelled)]),
+            )
+        streamer.finish()
+    except Exception as e:
+        streamer.finish(e)
+    finally:
+        try:
+            streamer.loop.call_soon_threadsafe(stream_slots.release)
+        except RuntimeError:
+            pass  # event loop already closed (shutdown)
+
+def stream_event(event: str, data: dict, sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+async def stream_answer(question: str, sse: bool):
+    received = time.perf_counter()
+    cancelled = threading.Event()
+    streamer = TokenStreamer(tokenizer, asyncio.get_running_loop())
+    pieces = []
+    outcome = "cancelled"
+
+    await stream_slots.acquire()
+    stream_stats["streams"] += 1
+    started = time.perf_counter()
+    threading.Thread(target=generate_streaming, args=(question, streamer, cancelled), daemon=True).start()
+    try:
+        while True:
+            item = await streamer.queue.get()
+            if item is StopIteration:
+                break
+            if isinstance(item, Exception):
+                outcome = "failed"
+                yield stream_event("error", {"detail": f"AI processing error: {str(item)}"}, sse)
+                return
+            pieces.append(item)
+            yield stream_event("token", {"text": item}, sse)
+        outcome = "completed"
+        # Same answer /chat would give (generated text up to a repeated "Bot:" turn is dropped there too)
+        answer = extract_answer("Bot:" + "".join(pieces))
+        remember_answer(question, answer)
+        yield stream_event("done", {"answer": answer, "cache": None, **stream_metrics(streamer, received, started)}, sse)
+    finally:
+        # Client disconnects land here too: stop generating at the next token
+        cancelled.set()
+        stream_stats[outcome] += 1
+        if outcome != "failed":
+            metrics = stream_metrics(streamer, received, started)
+            stream_stats["tokens"] += metrics["tokens"]
+            stream_stats["ttft_seconds"] += (metrics["ttft_ms"] or 0) / 1000
+            stream_stats["generate_seconds"] += time.perf_counter() - started
+            print(f"💬 stream {outcome}: {metrics['tokens']} tokens, TTFT {metrics['ttft_ms']} ms, {metrics['tokens_per_sec']} tokens/s")
+
+async def stream_cached(answer: str, tier: str, similarity: float, received: float, sse: bool):
+    yield stream_event("token", {"text": answer}, sse)
+    elapsed_ms = round((time.perf_counter() - received) * 1000, 1)
+    yield stream_event("done", {"answer": answer, "cache": tier, "similarity": similarity, "tokens": 0, "ttft_ms": elapsed_ms, "queued_ms": 0.0, "tokens_per_sec": None}, sse)
+
+def stream_metrics(streamer: TokenStreamer, received: float, started: float) -> dict:
+    elapsed = time.perf_counter() - started
+    first = streamer.first_token_at
+    return {
+        "tokens": streamer.tokens,
+        "ttft_ms": round((first - received) * 1000, 1) if first is not None else None,
+        "queued_ms": round((started - received) * 1000, 1),
+        "tokens_per_sec": round(streamer.tokens / elapsed, 1) if elapsed > 0 else None,
+    }
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(request: ChatRequest):
@@ -101,9 +273,19 @@ async def chat_with_ai(request: ChatRequest):
     
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
+    question = request.question.strip()
     
     try:
-        answer = ask_ocean_question(request.question.strip())
+        cached = answer_cache.get(question) if answer_cache is not None else None
+        if cached is not None:
+            answer, cache_tier, _ = cached
+        else:
+            cache_tier = None
+            if worker is None:
+                answer = ask_ocean_question(question)
+            else:
+                answer = await worker.run(question)
+            remember_answer(question, answer)
         
         # Determine confidence based on answer quality
         confidence = "high" if len(answer) > 10 and "error" not in answer.lower() else "medium"
@@ -112,12 +294,40 @@ async def chat_with_ai(request: ChatRequest):
             question=request.question,
             answer=answer,
             model_type="Fine-tuned Transformers",
-            confidence=confidence
+            confidence=confidence,
+            cache=cache_tier
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI processing error: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, format: str = None):
+    """Stream the answer token by token as NDJSON lines or server-sent events (format=sse, or Accept: text/event-stream).
+
+    The last message ("done") carries the full answer, time to first token and tokens/sec.
+    Closing the connection stops generation. Cached answers arrive as a single token.
+    """
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    if format not in (None, "ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+
+    received = time.perf_counter()
+    question = request.question.strip()
+    sse = format == "sse" or (format is None and "text/event-stream" in http_request.headers.get("accept", ""))
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    cached = answer_cache.get(question) if answer_cache is not None else None
+    if cached is not None:
+        return StreamingResponse(stream_cached(*cached, received, sse), media_type=media_type, headers=headers)
+    if model is None or tokenizer is None:
+        raise HTTPException(status_code=503, detail="AI model is not loaded yet. Please try again in a moment.")
+
+    return StreamingResponse(stream_answer(question, sse), media_type=media_type, headers=headers)
+
 @app.get("/health")
 async def health_check():
     """Health check for AI chatbot"""
@@ -127,7 +337,22 @@ async def health_check():
         "status": "healthy" if model is not None and tokenizer is not None else "loading",
         "model_loaded": model is not None,
         "tokenizer_loaded": tokenizer is not None,
-        "model_type": "Fine-tuned Ocean Chatbot"
+        "model_type": "Fine-tuned Ocean Chatbot",
+        "backend": backend,
+        "batching": worker.stats() if worker is not None else None,
+        "streaming": streaming_stats(),
+        "prefix_cache": prefix_cache.stats() if prefix_cache is not None else None,
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None
+    }
+
+def streaming_stats() -> dict:
+    finished = stream_stats["completed"] + stream_stats["cancelled"]
+    return {
+        **{k: stream_stats[k] for k in ("streams", "completed", "cancelled", "failed", "tokens")},
+        "active": stream_stats["streams"] - finished - stream_stats["failed"],
+        "max_streams": CHAT_MAX_STREAMS,
+        "mean_ttft_ms": round(stream_stats["ttft_seconds"] / finished * 1000, 1) if finished else None,
+        "tokens_per_sec": round(stream_stats["tokens"] / stream_stats["generate_seconds"], 1) if stream_stats["generate_seconds"] else None,
     }
 
 @app.get("/test")
@@ -139,10 +364,11 @@ async def test_ai():
         "What data did ARGO floats collect?"
     ]
     
-    results = []
-    for question in test_questions:
-        answer = ask_ocean_question(question)
-        results.append({"question": question, "answer": answer})
+    if worker is None:
+        answers = answer_batch(test_questions)
+    else:
+        answers = await asyncio.gather(*(worker.run(question) for question in test_questions))
+    results = [{"question": q, "answer": a} for q, a in zip(test_questions, answers)]
     
     return {"test_results": results}
 
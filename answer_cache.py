@@ -0,0 +1,298 @@
+"""
+Answer cache for the chatbot (used by ai_chatbot_server.py).
+
+Two tiers, checked in order:
+
+  exact     the question lowercased, with punctuation and whitespace folded
+  semantic  the nearest cached question by cosine similarity of embeddings,
+            if it is at least ANSWER_CACHE_THRESHOLD similar, mentions the
+            same numbers (float ids, depths, dates), so "temperature at
+            500 dbar" never answers "temperature at 1000 dbar", and, when
+            word order carries meaning, has the content words both
+            questions share in the same order
+
+Embeddings are hashed bags of content words (stop words dropped, plural -s
+folded) plus their character trigrams, L2-normalised: cheap enough to
+compute per request in microseconds, and they make rewordings such as
+"What is the ocean temperature?" and "ocean temperatures please" (near)
+identical while keeping "salinity" and "temperature" apart. A bag of words
+cannot tell "Is the Arabian Sea warmer than the Bay of Bengal?" from the
+question with the seas swapped, so questions that relate two things
+("than", "vs", "versus", "between", "from ... to") or name two or more
+places must also agree on word order; elsewhere reorderings such as
+"ocean temperature?" and "what's the temperature of the ocean" still
+match. Vectors live in a faiss inner-product index (faiss-cpu); without
+faiss, a numpy matrix does the same search.
+
+  python answer_cache.py   checks which question pairs share an answer
+
+Entries expire after ANSWER_CACHE_TTL_SECONDS and the least recently used
+are evicted beyond ANSWER_CACHE_MAX_ENTRIES; stats() reports hits per tier,
+hit rate, evictions and lookup time.
+
+Env:
+  ANSWER_CACHE              (default: 1; 0 disables the cache)
+  ANSWER_CACHE_MAX_ENTRIES  (default: 1024)
+  ANSWER_CACHE_TTL_SECONDS  (default: 3600)
+  ANSWER_CACHE_THRESHOLD    (cosine similarity, default: 0.9)
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # numpy search instead
+    faiss = None
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "1") != "0"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9"))
+
+EMBEDDING_DIM = 1024
+TRIGRAM_WEIGHT = 0.3
+
+_TERM = re.compile(r"\d+(?:\.\d+)?|[a-z]+(?:'[a-z]+)?")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# Questions whose meaning changes when their parts are swapped
+_RELATION = re.compile(r"\b(?:than|vs|versus|between)\b|\bfrom\b.*\bto\b")
+_PLACE = re.compile(r"\b(?:sea|ocean|bay|gulf|strait|channel|basin)s?\b")
+STOP_WORDS = frozenset(
+    "a an the of in on at to for from by with about and or is are was were be been do does did "
+    "what what's whats which who how me my i you your please tell show give can could would "
+    "there this that these those it its any some data information".split()
+)
+
+
+def normalize(question):
+    return " ".join(_TERM.findall(question.lower()))
+
+
+def content_terms(question):
+    terms = []
+    for term in _TERM.findall(question.lower()):
+        if term in STOP_WORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def _slot(feature):
+    h = zlib.crc32(feature.encode())
+    return h % EMBEDDING_DIM, 1.0 if h & 0x80000000 else -1.0
+
+
+def embed(question, terms=None):
+    """Hashed, L2-normalised bag of content words and their character trigrams."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for term in content_terms(question) if terms is None else terms:
+        index, sign = _slot(term)
+        vector[index] += sign
+        padded = f" {term} "
+        for i in range(len(padded) - 2):
+            index, sign = _slot(padded[i:i + 3])
+            vector[index] += sign * TRIGRAM_WEIGHT
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def numbers(question):
+    return frozenset(_NUMBER.findall(question))
+
+
+def order_matters(question):
+    """True for comparisons and routes ("than", "vs", "from ... to" ...) and questions naming two or more places."""
+    q = question.lower()
+    return bool(_RELATION.search(q)) or len(_PLACE.findall(q)) >= 2
+
+
+def same_order(terms, other):
+    """True unless content words found in both term lists appear in a different order."""
+    shared = set(terms) & set(other)
+    return [t for t in dict.fromkeys(terms) if t in shared] == [t for t in dict.fromkeys(other) if t in shared]
+
+
+class VectorIndex:
+    """Inner-product search over unit vectors by integer id: faiss when installed, numpy otherwise."""
+
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self.backend = "faiss" if faiss is not None else "numpy"
+        if faiss is not None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        else:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.vectors = np.zeros((0, dim), dtype=np.float32)
+
+    def add(self, entry_id, vector):
+        if faiss is not None:
+            self.index.add_with_ids(vector.reshape(1, -1), np.array([entry_id], dtype=np.int64))
+        else:
+            self.ids = np.append(self.ids, entry_id)
+            self.vectors = np.vstack([self.vectors, vector])
+
+    def remove(self, entry_id):
+        if faiss is not None:
+            self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+        else:
+            keep = self.ids != entry_id
+            self.ids, self.vectors = self.ids[keep], self.vectors[keep]
+
+    def search(self, vector, k=4):
+        """[(similarity, id)] of the k nearest vectors, best first."""
+        if faiss is not None:
+            if self.index.ntotal == 0:
+                return []
+            scores, ids = self.index.search(vector.reshape(1, -1), k)
+            return [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i != -1]
+        if not len(self.ids):
+            return []
+        scores = self.vectors @ vector
+        best = np.argsort(-scores)[:k]
+        return [(float(scores[i]), int(self.ids[i])) for i in best]
+
+
+class AnswerCache:
+    """Thread-safe LRU/TTL cache of answers with an exact and a semantic (embedding) tier."""
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS, threshold=ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries = OrderedDict()  # id -> (key, numbers, content terms, order matters, answer, stored at)
+        self._by_key = {}
+        self._index = VectorIndex()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.lookup_seconds = 0.0
+
+    def get(self, question):
+        """(answer, "exact" | "semantic", similarity) or None."""
+        start = time.perf_counter()
+        key = normalize(question)
+        vector = None
+        with self._lock:
+            try:
+                entry_id = self._by_key.get(key)
+                if entry_id is not None and self._live(entry_id):
+                    self.exact_hits += 1
+                    return self._entries[entry_id][4], "exact", 1.0
+                terms = content_terms(question)
+                vector = embed(question, terms)
+                wanted = numbers(question)
+                ordered = order_matters(question)
+                for similarity, entry_id in self._index.search(vector):
+                    if similarity < self.threshold:
+                        break
+                    if not self._live(entry_id):
+                        continue
+                    _, entry_numbers, entry_terms, entry_ordered, answer, _ = self._entries[entry_id]
+                    if entry_numbers != wanted:
+                        continue
+                    if (ordered or entry_ordered) and not same_order(terms, entry_terms):
+                        continue
+                    self.semantic_hits += 1
+                    return answer, "semantic", round(similarity, 4)
+                self.misses += 1
+                return None
+            finally:
+                self.lookup_seconds += time.perf_counter() - start
+
+    def put(self, question, answer):
+        key = normalize(question)
+        terms = content_terms(question)
+        vector = embed(question, terms)
+        with self._lock:
+            if key in self._by_key:
+                self._drop(self._by_key[key])
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, numbers(question), terms, order_matters(question), answer, time.monotonic())
+            self._by_key[key] = entry_id
+            self._index.add(entry_id, vector)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _live(self, entry_id):
+        """True (and marked recently used) unless the entry is gone or past its TTL, which drops it."""
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[5] > self.ttl_seconds:
+            self._drop(entry_id)
+            self.expired += 1
+            return False
+        self._entries.move_to_end(entry_id)
+        return True
+
+    def _drop(self, entry_id):
+        key = self._entries.pop(entry_id)[0]
+        if self._by_key.get(key) == entry_id:
+            del self._by_key[key]
+        self._index.remove(entry_id)
+
+    def clear(self):
+        with self._lock:
+            for entry_id in list(self._entries):
+                self._drop(entry_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "index": self._index.backend,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "mean_lookup_ms": round(self.lookup_seconds / lookups * 1000, 3) if lookups else None,
+            }
+
+
+if __name__ == "__main__":
+    # (cached question, asked question, should the cached answer be reused)
+    PAIRS = [
+        ("What is the ocean temperature?", "ocean temperatures please", True),
+        ("ocean temperature?", "what's the temperature of the ocean", True),
+        ("what's the temperature of the ocean", "ocean temperature?", True),
+        ("What is the ocean temperature?", "temperature of the ocean", True),
+        ("salinity in the Bay of Bengal", "Bay of Bengal salinity", True),
+        ("What is the salinity?", "what's the salinity", True),
+        ("How deep do the floats go in the Arabian Sea?", "How deep do floats go in the arabian sea", True),
+        ("What is the salinity?", "What is the temperature?", False),
+        ("Temperature at 500 dbar", "Temperature at 1000 dbar", False),
+        ("Is the Arabian Sea warmer than the Bay of Bengal?", "Is the Bay of Bengal warmer than the Arabian Sea?", False),
+        ("Arabian Sea vs Bay of Bengal salinity", "Bay of Bengal vs Arabian Sea salinity", False),
+        ("Floats drifting from the Arabian Sea to the Bay of Bengal", "Floats drifting from the Bay of Bengal to the Arabian Sea", False),
+        ("Is the Arabian Sea warmer than the Bay of Bengal?", "is arabian sea warmer than bay of bengal", True),
+    ]
+    failed = 0
+    for cached, asked, expected in PAIRS:
+        cache = AnswerCache()
+        cache.put(cached, "answer")
+        hit = cache.get(asked)
+        ok = (hit is not None) == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {hit[1] + ' ' + str(hit[2]) if hit else 'miss':<16} {cached!r} -> {asked!r}")
+    raise SystemExit(1 if failed else 0)
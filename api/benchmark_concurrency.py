@@ -0,0 +1,112 @@
+"""
+api/benchmark_concurrency.py
+
+Load test for a running API: N concurrent clients issue a mix of /profile
+and /floats requests for a fixed duration, while a separate probe keeps
+calling "/" (no database work). Reports p50/p99 latency per endpoint; a
+probe p99 close to the DB endpoints' means the event loop is being blocked.
+
+Usage:
+  uvicorn main:app --port 8000            # in another shell, from api/
+  python benchmark_concurrency.py [--clients 100] [--duration 20] [--base-url http://localhost:8000]
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def pick_float_ids(base_url, count=20):
+    response = requests.get(f"{base_url}/floats", params={"limit": count}, timeout=30)
+    response.raise_for_status()
+    return [f["float_id"] for f in response.json()["floats"]]
+
+
+def client(base_url, float_ids, deadline, profile_share, seed, results, lock):
+    rng = random.Random(seed)
+    session = requests.Session()
+    local = defaultdict(list)
+    errors = defaultdict(int)
+    while time.monotonic() < deadline:
+        if rng.random() < profile_share:
+            name = "/profile"
+            params = {"float_id": rng.choice(float_ids), "limit": 100}
+        else:
+            name = "/floats"
+            params = {"limit": rng.choice((50, 100, 500))}
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{base_url}{name}", params=params, timeout=60)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = (time.perf_counter() - start) * 1000
+        if ok:
+            local[name].append(elapsed)
+        else:
+            errors[name] += 1
+    with lock:
+        for name, timings in local.items():
+            results[name].extend(timings)
+        for name, n in errors.items():
+            results[f"{name} errors"].append(n)
+
+
+def probe(base_url, deadline, results, lock):
+    session = requests.Session()
+    timings = []
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        session.get(f"{base_url}/", timeout=60)
+        timings.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    with lock:
+        results["/ (probe)"].extend(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--profile-share", type=float, default=0.7, help="Fraction of requests that hit /profile")
+    args = parser.parse_args()
+
+    float_ids = pick_float_ids(args.base_url)
+    if not float_ids:
+        raise SystemExit("No floats returned by /floats; load some data first.")
+
+    results = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    with ThreadPoolExecutor(max_workers=args.clients + 1) as pool:
+        pool.submit(probe, args.base_url, deadline, results, lock)
+        for n in range(args.clients):
+            pool.submit(client, args.base_url, float_ids, deadline, args.profile_share, n, results, lock)
+
+    print(f"{args.clients} clients for {args.duration:.0f}s against {args.base_url}")
+    total = 0
+    for name in ("/profile", "/floats", "/ (probe)"):
+        timings = results.get(name, [])
+        if name != "/ (probe)":
+            total += len(timings)
+        errors = sum(results.get(f"{name} errors", []))
+        print(f"  {name:<10} n={len(timings):6d}  errors={errors:4d}  "
+              f"p50={percentile(timings, 50):8.1f} ms  p99={percentile(timings, 99):8.1f} ms")
+    print(f"  throughput: {total / args.duration:.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
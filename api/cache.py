@@ -0,0 +1,258 @@
+"""
+Response cache for the read-heavy aggregate endpoints (/daily-avg, /floats).
+
+Responses are stored as encoded JSON bytes under a key made of the endpoint,
+its normalized query parameters and the current data version. The loader
+bumps the version (table data_version) in the same transaction that commits
+new observations, so a new load makes every older entry unreachable and the
+next request recomputes it; the TTL only bounds how long an entry may live
+when nothing was loaded.
+
+The version is also sent as the ETag, so a client that repeats a request with
+If-None-Match gets a 304 without the cache or database being touched.
+
+Backends: an in-process LRU (default) or, with RESPONSE_CACHE_URL=redis://...
+and the redis package installed, a shared Redis so several API workers share
+entries. Both expose get/set/clear and the local one is the stand-in whenever
+Redis is not configured or reachable.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+import psycopg2
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from database import fetch_all, run_db
+
+log = logging.getLogger("api.cache")
+
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+CACHE_URL = os.getenv("RESPONSE_CACHE_URL")  # e.g. redis://localhost:6379/0
+# How often the data version is re-read from the database
+DATA_VERSION_POLL_INTERVAL = float(os.getenv("DATA_VERSION_POLL_INTERVAL", "5"))
+
+
+class LocalCache:
+    """Thread-safe in-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Shared backend; Redis enforces the TTL and does its own eviction."""
+
+    prefix = "floatchat:response:"
+
+    def __init__(self, url, ttl):
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self.evictions = 0
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, value, ex=max(1, int(self.ttl)))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*", count=500):
+            self._client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*", count=500))
+
+
+def _make_backend():
+    if CACHE_URL:
+        try:
+            return RedisCache(CACHE_URL, CACHE_TTL)
+        except Exception as e:  # redis missing or unreachable
+            log.warning("Shared response cache unavailable (%s); using in-process cache", e)
+    return LocalCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+
+
+class DataVersion:
+    """Latest data_version.version, re-read at most every `poll_interval` seconds."""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._value = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _read():
+        try:
+            rows = fetch_all("SELECT version FROM data_version WHERE id = 1")
+        except psycopg2.errors.UndefinedTable:
+            # Nothing has been loaded through load_to_postgres.py yet
+            return 0
+        return rows[0]["version"] if rows else 0
+
+    async def current(self):
+        if self._value is None or time.monotonic() - self._checked_at >= self.poll_interval:
+            self._value = await run_db(self._read)
+            self._checked_at = time.monotonic()
+        return self._value
+
+
+class DepthBands:
+    """Labels of the depth_bands table (written by scripts/daily_rollup.py), re-read at most every `poll_interval` seconds."""
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self._value = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def _read():
+        try:
+            return [row["label"] for row in fetch_all("SELECT label FROM depth_bands ORDER BY band")]
+        except psycopg2.errors.UndefinedTable:
+            # Rollup not built yet; the endpoints report that themselves
+            return None
+
+    async def labels(self):
+        """Known labels in band order, or None without a depth_bands table."""
+        if time.monotonic() - self._checked_at >= self.poll_interval:
+            self._value = await run_db(self._read)
+            self._checked_at = time.monotonic()
+        return self._value
+
+
+class ResponseCache:
+    def __init__(self, backend, data_version):
+        self.backend = backend
+        self.data_version = data_version
+        self._seen_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(params):
+        """Canonical query string: unset parameters dropped, keys sorted, strings trimmed."""
+        normalized = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            normalized[name] = value
+        return urlencode(sorted(normalized.items()))
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _check_version(self, version):
+        # Drop everything cached for older data rather than waiting for the TTL
+        with self._lock:
+            changed = self._seen_version is not None and version != self._seen_version
+            self._seen_version = version
+            if changed:
+                self.invalidations += 1
+        if changed:
+            self.backend.clear()
+
+    async def respond(self, request: Request, endpoint, params, compute, media_type="application/json", headers=None):
+        """Serve `endpoint` for `params` from cache, or `await compute()` and cache its result.
+
+        `compute` returns either a JSON-able object or an already encoded body
+        (bytes) in `media_type`; `params` must include anything that changes
+        the body, such as the response format.
+        """
+        version = await self.data_version.current()
+        self._check_version(version)
+        query = self.normalize(params)
+        digest = hashlib.sha1(f"{endpoint}?{query}".encode()).hexdigest()[:12]
+        etag = f'"v{version}-{digest}"'
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            self._count("not_modified")
+            return Response(status_code=304, headers={"ETag": etag})
+
+        key = f"{version}:{endpoint}?{query}"
+        body = self.backend.get(key)
+        if body is not None:
+            self._count("hits")
+            status = "HIT"
+        else:
+            self._count("misses")
+            status = "MISS"
+            body = await compute()
+            if not isinstance(body, bytes):
+                body = JSONResponse(content=jsonable_encoder(body)).body
+            self.backend.set(key, body)
+        return Response(
+            content=body,
+            media_type=media_type,
+            headers={"ETag": etag, "X-Cache": status, "X-Data-Version": str(version), **(headers or {})},
+        )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.backend.evictions,
+                "invalidations": self.invalidations,
+                "data_version": self._seen_version,
+            }
+
+
+response_cache = ResponseCache(_make_backend(), DataVersion(DATA_VERSION_POLL_INTERVAL))
+depth_bands = DepthBands(DATA_VERSION_POLL_INTERVAL)
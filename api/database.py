@@ -1,7 +1,15 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from collections import deque
+import asyncio
+import functools
 import os
+import threading
+import time
+import uuid
 
 # Database connection parameters
 DATABASE_CONFIG = {
@@ -12,20 +20,236 @@ DATABASE_CONFIG = {
     "port": "5433"
 }
 
+# Pool settings (override via environment)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+# Connections idle for longer than this are pinged before being handed out
+POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))
+# Threads that run blocking queries for the async endpoints; defaults to one
+# per pooled connection so a worker never sits waiting for a connection
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", str(POOL_MAX_SIZE)))
+# Rows fetched per round trip by server-side (streaming) cursors
+STREAM_ITERSIZE = int(os.getenv("DB_STREAM_ITERSIZE", "2000"))
+
+
+class PoolExhaustedError(Exception):
+    """No connection became free within the pool timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool with a bounded wait, health checks and checkout metrics.
+
+    psycopg2's own pool raises immediately when every connection is in use;
+    here callers queue on a semaphore for up to `timeout` seconds instead, so a
+    burst of requests waits briefly rather than failing or opening more
+    backends than `maxconn`.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_after, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self._connect_kwargs = connect_kwargs
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._stats_lock = threading.Lock()
+        self._waits_ms = deque(maxlen=1000)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def _get_pool(self):
+        # Created lazily so importing the API does not require a live database
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = ThreadedConnectionPool(self.minconn, self.maxconn, **self._connect_kwargs)
+        return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        pool = self._get_pool()
+        # Every connection in the pool may have gone stale (e.g. after a DB restart)
+        for _ in range(self.maxconn + 1):
+            conn = pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            pool.putconn(conn, close=True)
+            with self._stats_lock:
+                self.discarded += 1
+        raise psycopg2.OperationalError("Could not obtain a healthy database connection")
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._stats_lock:
+                self.timeouts += 1
+            raise PoolExhaustedError(
+                f"No database connection available within {self.timeout:.1f}s (pool size {self.maxconn})"
+            )
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            with self._stats_lock:
+                self._waits_ms.append((time.perf_counter() - start) * 1000)
+                self.checkouts += 1
+                self.in_use += 1
+            yield conn
+        except Exception:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            if conn is not None:
+                close = broken or bool(conn.closed)
+                if close:
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn, close=close)
+                with self._stats_lock:
+                    self.in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            waits = sorted(self._waits_ms)
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "discarded_unhealthy": self.discarded,
+                "wait_ms_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_ms_p95": round(waits[int(len(waits) * 0.95) - 1], 3) if waits else 0.0,
+                "wait_ms_max": round(waits[-1], 3) if waits else 0.0,
+            }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+
+db_pool = ConnectionPool(
+    POOL_MIN_SIZE,
+    POOL_MAX_SIZE,
+    POOL_TIMEOUT,
+    POOL_HEALTHCHECK_AFTER,
+    cursor_factory=RealDictCursor,
+    **DATABASE_CONFIG,
+)
+
+
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    conn = None
-    try:
-        conn = psycopg2.connect(cursor_factory=RealDictCursor, **DATABASE_CONFIG)
+    """Context manager for pooled database connections"""
+    with db_pool.connection() as conn:
         yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+
+def fetch_all(query, params=None):
+    """Run one query on a pooled connection and return all rows"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def iter_rows(query, params=None, itersize=STREAM_ITERSIZE):
+    """Yield the rows of a query from a server-side cursor, `itersize` rows per round trip.
+
+    Only one batch is held in memory at a time. The pooled connection stays
+    checked out until the generator is exhausted or closed.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            yield from cur
+
+
+def fetch_columns(query, params=None):
+    """Run one query and return (column names, type OIDs, rows as tuples), without per-row dicts"""
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            return [d.name for d in cur.description], [d.type_code for d in cur.description], rows
+
+
+def iter_row_batches(query, params=None, batch_size=STREAM_ITERSIZE):
+    """Server-side cursor variant of fetch_columns(): yields (names, type OIDs, tuples) per batch.
+
+    The first batch is always yielded, even when empty, so callers learn the columns.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchmany(batch_size)
+            names = [d.name for d in cur.description]
+            type_codes = [d.type_code for d in cur.description]
+            yield names, type_codes, rows
+            while rows:
+                rows = cur.fetchmany(batch_size)
+                if rows:
+                    yield names, type_codes, rows
+
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+
+def _run_queued(fn, queued_at, args, kwargs):
+    # A request that sat in the executor queue for the whole pool timeout
+    # gets the same 503 as one that could not get a connection
+    waited = time.monotonic() - queued_at
+    if waited > POOL_TIMEOUT:
+        with db_pool._stats_lock:
+            db_pool.timeouts += 1
+        raise PoolExhaustedError(
+            f"Database workers busy for {waited:.1f}s ({DB_EXECUTOR_WORKERS} workers)"
+        )
+    return fn(*args, **kwargs)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking database code `fn(*args, **kwargs)` off the event loop.
+
+    psycopg2 calls block the calling thread, so calling them directly from an
+    `async def` endpoint stalls every other request on the server. The work
+    goes to a bounded thread pool instead and the endpoint awaits the result.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_run_queued, fn, time.monotonic(), args, kwargs)
+    return await loop.run_in_executor(db_executor, call)
+
+
+def close_db():
+    db_executor.shutdown(wait=False)
+    db_pool.close()
+
 
 def get_cursor():
     """Get database cursor for queries"""
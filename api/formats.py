@@ -0,0 +1,206 @@
+"""
+Content negotiation and columnar encodings for the data endpoints.
+
+Besides the default row-object JSON, /profile, /floats and /daily-avg can
+answer with
+
+- columnar JSON  (format=columnar or Accept: application/vnd.floatchat.columnar+json):
+  {"columns": [...], "data": [[column 1 values], [column 2 values], ...]},
+  so column names appear once and numbers stay numbers;
+- Arrow IPC stream (format=arrow or Accept: application/vnd.apache.arrow.stream);
+- Parquet (format=parquet or Accept: application/vnd.apache.parquet).
+
+All three are built from plain cursor tuples transposed into columns; no
+per-row dict is created. Arrow and Parquet types come from the PostgreSQL
+column types, so every batch of a streamed result has the same schema.
+"""
+
+import io
+import json
+import tempfile
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from database import iter_row_batches, run_db
+from streaming import NDJSON_MEDIA_TYPE, json_default
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow/Parquet responses are then unavailable
+    pa = pq = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "columnar": "application/vnd.floatchat.columnar+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Formats meant for whole-result downloads: streamed, not paged
+DOWNLOAD_FORMATS = ("ndjson", "arrow", "parquet")
+FILE_EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+# Parquet output is spooled to disk beyond this size
+PARQUET_SPOOL_BYTES = 16 * 1024 * 1024
+
+
+def negotiate(request: Request, format=None):
+    """Pick the response format from ?format= or, failing that, the Accept header."""
+    if format:
+        if format not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(MEDIA_TYPES)}")
+        chosen = format
+    else:
+        accept = request.headers.get("accept", "")
+        chosen = next((name for name, media in MEDIA_TYPES.items() if name != "json" and media in accept), "json")
+    if chosen in ("arrow", "parquet") and pa is None:
+        raise HTTPException(status_code=406, detail="Arrow and Parquet responses need pyarrow installed")
+    return chosen
+
+
+# ------------------------------------------------------------
+# Columnar JSON
+# ------------------------------------------------------------
+def columnar_json(names, rows, **extra):
+    """{"columns": names, "data": [column arrays], "row_count": n, **extra} as UTF-8 bytes."""
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in names]
+    body = {"columns": names, "data": columns, "row_count": len(rows), **extra}
+    return json.dumps(body, default=json_default, separators=(",", ":")).encode()
+
+
+# ------------------------------------------------------------
+# Arrow / Parquet
+# ------------------------------------------------------------
+def _arrow_type(type_code):
+    # PostgreSQL type OIDs -> Arrow types; anything unknown travels as text
+    return {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+    }.get(type_code, pa.string())
+
+
+def arrow_schema(names, type_codes):
+    return pa.schema([(name, _arrow_type(code)) for name, code in zip(names, type_codes)])
+
+
+def record_batch(schema, rows):
+    arrays = []
+    columns = zip(*rows) if rows else [() for _ in schema]
+    for field, values in zip(schema, columns):
+        if field.type == pa.string():
+            values = [None if v is None else str(v) for v in values]
+        elif pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write target that hands back whatever was written since the last take()."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _arrow_stream(batches):
+    """Yield an Arrow IPC stream chunk by chunk from (names, type_codes, rows) batches."""
+    sink = _ChunkSink()
+    writer = None
+    for names, type_codes, rows in batches:
+        if writer is None:
+            schema = arrow_schema(names, type_codes)
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(record_batch(schema, rows))
+        yield sink.take()
+    if writer is not None:
+        writer.close()
+        yield sink.take()
+
+
+def _write_parquet(batches, target):
+    writer = None
+    for names, type_codes, rows in batches:
+        if writer is None:
+            schema = arrow_schema(names, type_codes)
+            writer = pq.ParquetWriter(target, schema, compression="zstd")
+        writer.write_batch(record_batch(schema, rows))
+    if writer is not None:
+        writer.close()
+
+
+def encode(fmt, names, type_codes, rows, **extra):
+    """Encode one fully fetched result as columnar JSON, Arrow IPC or Parquet bytes."""
+    if fmt == "columnar":
+        return columnar_json(names, rows, **extra)
+    # An empty result still gives a valid file with the right columns
+    batches = [(names, type_codes, rows)]
+    if fmt == "arrow":
+        return b"".join(_arrow_stream(batches))
+    buffer = io.BytesIO()
+    _write_parquet(batches, buffer)
+    return buffer.getvalue()
+
+
+def download_headers(fmt, filename):
+    if fmt not in FILE_EXTENSIONS:
+        return {}
+    return {"Content-Disposition": f'attachment; filename="{filename}.{FILE_EXTENSIONS[fmt]}"'}
+
+
+async def columnar_download(fmt, query, params, filename, not_found=None):
+    """Stream the whole result of `query` as Arrow IPC, or spool it to a Parquet file and send that.
+
+    Rows come from a server-side cursor in batches, so memory is bounded by
+    one batch (Arrow) or the spool threshold (Parquet).
+    """
+    batches = iter_row_batches(query, params)
+    first = await run_db(next, batches)
+    if not first[2] and not_found:
+        raise HTTPException(status_code=404, detail=not_found)
+    headers = download_headers(fmt, filename)
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    if fmt == "arrow":
+        return StreamingResponse(_arrow_stream(all_batches()), media_type=MEDIA_TYPES[fmt], headers=headers)
+
+    def spool():
+        spooled = tempfile.SpooledTemporaryFile(max_size=PARQUET_SPOOL_BYTES)
+        _write_parquet(all_batches(), spooled)
+        spooled.seek(0)
+        return spooled
+
+    spooled = await run_db(spool)
+
+    def chunks():
+        with spooled:
+            while True:
+                data = spooled.read(1 << 20)
+                if not data:
+                    return
+                yield data
+
+    return StreamingResponse(chunks(), media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -1,8 +1,18 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware  # ADD THIS
-from database import get_db_connection
+from fastapi.responses import JSONResponse, Response
+from database import get_db_connection, db_pool, fetch_all, fetch_columns, run_db, close_db, PoolExhaustedError
+from cache import depth_bands, response_cache
+from formats import (
+    DOWNLOAD_FORMATS, MEDIA_TYPES, columnar_download, columnar_json, download_headers, encode, negotiate,
+)
+from spatial import MATCH_COLUMNS, bbox_condition, distance_km, parse_polygon, polygon_condition, radius_condition
+from streaming import decode_cursor, ndjson_response, page
+from simple_nlp import intent_engine, process_question
+from tiles import GRID_ZOOM, cell_ranges, cell_size, floats_query, ranges_key, values_query
 from typing import Optional, List, Dict, Any
 import json
+import psycopg2
 import sys
 import os
 
@@ -19,21 +29,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache", "X-Data-Version"],
 )
 
+async def check_depth_band(depth_band):
+    # An unknown label would match no band and silently return no data
+    if depth_band is None:
+        return
+    labels = await depth_bands.labels()
+    if labels is not None and depth_band not in labels:
+        raise HTTPException(status_code=400, detail=f"depth_band must be one of {', '.join(labels)}")
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    close_db()
+    # Keep the question -> SQL plans for the next start
+    intent_engine.plan_cache.save()
+
+@app.exception_handler(PoolExhaustedError)
+async def pool_exhausted_handler(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 @app.get("/")
 async def root():
     return {"message": "ARGO Ocean Data API", "status": "running"}
 
 @app.get("/daily-avg")
 async def get_daily_averages(
+    request: Request,
     var: str = Query(..., description="Variable: temperature, salinity, or pressure"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    resolution: str = Query("day", description="Bucket size: day, week or month"),
+    depth_band: Optional[str] = Query(None, description="Depth band label, e.g. 0-10, 10-100, 2000+"),
+    format: Optional[str] = Query(None, description="json (default), columnar, arrow or parquet")
 ):
-    """Get daily averages for temperature, salinity, or pressure"""
+    """Get daily (or weekly/monthly) averages for temperature, salinity, or pressure
+
+    Re-aggregates the per-day sums and counts in daily_rollup, so coarser
+    buckets and depth bands never rescan raw observations.
+    """
     
-    # Map variable to view name
+    # Map variable to view name (used until daily_rollup exists)
     view_mapping = {
         "temperature": "daily_avg_temperature",
         "salinity": "daily_avg_salinity", 
@@ -42,43 +79,104 @@ async def get_daily_averages(
     
     if var not in view_mapping:
         raise HTTPException(status_code=400, detail="Variable must be temperature, salinity, or pressure")
-    
-    view_name = view_mapping[var]
-    
-    # Build query with optional date filters
-    query = f"SELECT day, avg_value, num_observations FROM {view_name}"
+    if resolution not in ("day", "week", "month"):
+        raise HTTPException(status_code=400, detail="Resolution must be day, week, or month")
+    await check_depth_band(depth_band)
+    fmt = negotiate(request, format)
+    if fmt == "ndjson":
+        raise HTTPException(status_code=400, detail="ndjson is only available for /profile and /floats")
+
+    bucket = "day" if resolution == "day" else f"CAST(date_trunc('{resolution}', day) AS date)"
+    conditions = []
     params = []
-    
-    if start_date or end_date:
-        query += " WHERE"
-        conditions = []
-        if start_date:
-            conditions.append(" day >= %s")
-            params.append(start_date)
-        if end_date:
-            conditions.append(" day <= %s")
-            params.append(end_date)
-        query += " AND".join(conditions)
-    
-    query += " ORDER BY day"
-    
+    if start_date:
+        conditions.append("day >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("day <= %s")
+        params.append(end_date)
+
+    rollup_conditions = ["variable = %s"] + conditions
+    rollup_params = [var] + params
+    if depth_band:
+        rollup_conditions.append("depth_band = (SELECT band FROM depth_bands WHERE label = %s)")
+        rollup_params.append(depth_band)
+    query = f"""
+    SELECT {bucket} AS day,
+           SUM(value_sum) / SUM(value_count) AS avg_value,
+           CAST(SUM(value_count) AS BIGINT) AS num_observations
+    FROM daily_rollup
+    WHERE {" AND ".join(rollup_conditions)}
+    GROUP BY 1
+    ORDER BY 1
+    """
+
+    def fetch_averages(fetch=fetch_all):
+        try:
+            return fetch(query, rollup_params)
+        except psycopg2.errors.UndefinedTable:
+            # Database not migrated yet (python scripts/daily_rollup.py rebuild);
+            # the per-day views can still be re-weighted into coarser buckets
+            if depth_band:
+                raise HTTPException(status_code=400, detail="Depth bands need the daily_rollup table")
+            view_query = f"""
+            SELECT {bucket} AS day,
+                   SUM(avg_value * num_observations) / SUM(num_observations) AS avg_value,
+                   CAST(SUM(num_observations) AS BIGINT) AS num_observations
+            FROM {view_mapping[var]}
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            GROUP BY 1
+            ORDER BY 1
+            """
+            return fetch(view_query, params)
+
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, params)
-                results = cur.fetchall()
-                return {"variable": var, "data": results}
+        async def compute():
+            if fmt != "json":
+                names, type_codes, rows = await run_db(fetch_averages, fetch_columns)
+                return encode(fmt, names, type_codes, rows,
+                              variable=var, resolution=resolution, depth_band=depth_band)
+            return {"variable": var, "resolution": resolution, "depth_band": depth_band,
+                    "data": await run_db(fetch_averages)}
+
+        return await response_cache.respond(
+            request, "daily-avg",
+            {"var": var, "start_date": start_date, "end_date": end_date,
+             "resolution": resolution, "depth_band": depth_band, "format": fmt},
+            compute,
+            media_type=MEDIA_TYPES[fmt],
+            headers=download_headers(fmt, f"daily_avg_{var}"),
+        )
+    except (PoolExhaustedError, HTTPException):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Sort key of /profile pages: (cycle, pressure, time), a float's samples in
+# order, with missing values folded to sentinels that sort last so the keyset
+# comparison never turns NULL. idx_argo_profile_key indexes exactly these
+# expressions after float_id (scripts/observation_partitions.py indexes).
+PROFILE_KEY = "COALESCE(cycle, 2147483647), COALESCE(pressure, 'Infinity'::float8), COALESCE(time, 'infinity'::timestamp)"
+PROFILE_CURSOR = "COALESCE(%s, 2147483647), COALESCE(%s::float8, 'Infinity'::float8), COALESCE(%s::timestamp, 'infinity'::timestamp)"
+
 @app.get("/profile")
 async def get_float_profile(
+    request: Request,
     float_id: str = Query(..., description="Float ID"),
     cycle: Optional[int] = Query(None, description="Specific cycle number"),
-    limit: int = Query(100, description="Maximum number of records")
+    limit: Optional[int] = Query(None, description="Maximum number of records (default 100; unlimited when streaming)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: Optional[str] = Query(None, description="json (default), columnar, or ndjson/arrow/parquet to download every row")
 ):
-    """Get profile data for a specific float"""
+    """Get profile data for a specific float, ordered by (cycle, pressure)
+
+    JSON and columnar JSON are paged with keyset cursors on (cycle, pressure,
+    time); rows without a cycle, pressure or time sort last. ndjson, arrow and
+    parquet stream every row from a server-side cursor.
+    """
     
+    fmt = negotiate(request, format)
+    stream = fmt in DOWNLOAD_FORMATS
     query = """
     SELECT float_id, cycle, time, lat, lon, pressure, temperature, salinity
     FROM argo_profiles 
@@ -86,80 +184,293 @@ async def get_float_profile(
     """
     params = [float_id]
     
-    if cycle:
+    if cycle is not None:
         query += " AND cycle = %s"
         params.append(cycle)
+    if cursor:
+        query += f" AND ({PROFILE_KEY}) > ({PROFILE_CURSOR})"
+        params.extend(decode_cursor(cursor, 3))
     
-    query += " ORDER BY pressure ASC LIMIT %s"
-    params.append(limit)
+    query += f" ORDER BY {PROFILE_KEY}"
+    if limit is None and not stream:
+        limit = 100
+    if limit is not None:
+        query += " LIMIT %s"
+        # One extra row tells whether there is a next page
+        params.append(limit if stream else limit + 1)
     
+    not_found = "Float not found" if not cursor else None
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, params)
-                results = cur.fetchall()
-                if not results:
-                    raise HTTPException(status_code=404, detail="Float not found")
-                return {"float_id": float_id, "cycle": cycle, "profile": results}
+        if fmt == "ndjson":
+            return await ndjson_response(query, params, not_found=not_found)
+        if stream:
+            return await columnar_download(fmt, query, params, f"profile_{float_id}", not_found=not_found)
+        if fmt == "columnar":
+            names, _, results = await run_db(fetch_columns, query, params)
+        else:
+            results = await run_db(fetch_all, query, params)
+    except (PoolExhaustedError, HTTPException):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not results and not cursor:
+        raise HTTPException(status_code=404, detail="Float not found")
+    if fmt == "columnar":
+        cycle_col, pressure_col, time_col = names.index("cycle"), names.index("pressure"), names.index("time")
+        results, next_cursor = page(results, limit, lambda row: (row[cycle_col], row[pressure_col], row[time_col]))
+        body = columnar_json(names, results, float_id=float_id, cycle=cycle, next_cursor=next_cursor)
+        return Response(content=body, media_type=MEDIA_TYPES[fmt])
+    results, next_cursor = page(results, limit, lambda row: (row["cycle"], row["pressure"], row["time"]))
+    return {"float_id": float_id, "cycle": cycle, "profile": results, "next_cursor": next_cursor}
+
+FLOAT_SUMMARY_COLUMNS = """
+    float_id, first_observation, last_observation, total_observations, total_profiles,
+    avg_lat, avg_lon, lat_min, lat_max, lon_min, lon_max, last_cycle, last_lat, last_lon
+"""
+
+LEGACY_FLOATS_QUERY = """
+SELECT float_id,
+       MIN(time) as first_observation,
+       MAX(time) as last_observation,
+       COUNT(*) as total_observations,
+       AVG(lat) as avg_lat,
+       AVG(lon) as avg_lon
+FROM argo_profiles
+WHERE (%(lat_min)s::float IS NULL OR lat >= %(lat_min)s)
+  AND (%(lat_max)s::float IS NULL OR lat <= %(lat_max)s)
+  AND (%(lon_min)s::float IS NULL OR lon >= %(lon_min)s)
+  AND (%(lon_max)s::float IS NULL OR lon <= %(lon_max)s)
+GROUP BY float_id
+ORDER BY first_observation DESC
+LIMIT %(limit)s
+"""
 
 @app.get("/floats")
 async def get_floats_list(
+    request: Request,
     lat_min: Optional[float] = Query(None, description="Minimum latitude"),
     lat_max: Optional[float] = Query(None, description="Maximum latitude"),
     lon_min: Optional[float] = Query(None, description="Minimum longitude"), 
     lon_max: Optional[float] = Query(None, description="Maximum longitude"),
-    limit: int = Query(50, description="Maximum number of floats")
+    limit: Optional[int] = Query(None, description="Maximum number of floats (default 50; unlimited when streaming)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: Optional[str] = Query(None, description="json (default), columnar, or ndjson/arrow/parquet for every float")
 ):
-    """Get list of available floats, optionally filtered by geographic bounds"""
-    
-    query = """
-    SELECT DISTINCT float_id, 
-           MIN(time) as first_observation,
-           MAX(time) as last_observation,
-           COUNT(*) as total_observations,
-           AVG(lat) as avg_lat,
-           AVG(lon) as avg_lon
-    FROM argo_profiles
+    """Get list of available floats, optionally filtered by geographic bounds
+
+    Served from float_summary (kept up to date by the loader); a float matches
+    when any of its profiles lies inside the bounds. lon_min > lon_max means
+    the box crosses the antimeridian. Newest floats first, paged with keyset
+    cursors on (first_observation, float_id).
     """
-    
+
     conditions = []
     params = []
-    
-    # Add geographic filters if provided
-    if lat_min is not None:
-        conditions.append("lat >= %s")
-        params.append(lat_min)
-    if lat_max is not None:
-        conditions.append("lat <= %s") 
-        params.append(lat_max)
-    if lon_min is not None:
-        conditions.append("lon >= %s")
-        params.append(lon_min)
-    if lon_max is not None:
-        conditions.append("lon <= %s")
-        params.append(lon_max)
-        
+
+    # Add geographic filters if provided (index-backed, antimeridian-aware)
+    if any(bound is not None for bound in (lat_min, lat_max, lon_min, lon_max)):
+        condition, bbox_params = bbox_condition("track", lat_min, lat_max, lon_min, lon_max)
+        conditions.append(condition)
+        params.extend(bbox_params)
+
+    if cursor:
+        conditions.append("(first_observation, float_id) < (%s::timestamp, %s)")
+        params.extend(decode_cursor(cursor, 2))
+
+    query = f"SELECT {FLOAT_SUMMARY_COLUMNS} FROM float_summary"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
-    
-    query += """ 
-    GROUP BY float_id 
-    ORDER BY first_observation DESC 
-    LIMIT %s
+    query += " ORDER BY first_observation DESC, float_id DESC"
+    fmt = negotiate(request, format)
+    stream = fmt in DOWNLOAD_FORMATS
+    if limit is None and not stream:
+        limit = 50
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit if stream else limit + 1)
+
+    def fetch_floats(fetch=fetch_all):
+        try:
+            return fetch(query, params)
+        except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn):
+            # Database not migrated yet: aggregate the raw rows as before
+            # (python scripts/float_summary.py rebuild creates the table)
+            if cursor:
+                raise HTTPException(status_code=400, detail="Cursors need the float_summary table")
+            return fetch(LEGACY_FLOATS_QUERY, {
+                "lat_min": lat_min, "lat_max": lat_max, "lon_min": lon_min, "lon_max": lon_max,
+                "limit": limit if stream else limit + 1,
+            })
+
+    try:
+        if fmt == "ndjson":
+            return await ndjson_response(query, params)
+
+        async def compute():
+            if fmt == "json":
+                floats, next_cursor = page(
+                    await run_db(fetch_floats), limit, lambda row: (row["first_observation"], row["float_id"])
+                )
+                return {"floats": floats, "next_cursor": next_cursor}
+            # The float list is small enough to encode whole, so Arrow and
+            # Parquet downloads go through the cache like JSON pages
+            names, type_codes, rows = await run_db(fetch_floats, fetch_columns)
+            next_cursor = None
+            if not stream:
+                time_col, id_col = names.index("first_observation"), names.index("float_id")
+                rows, next_cursor = page(rows, limit, lambda row: (row[time_col], row[id_col]))
+            return encode(fmt, names, type_codes, rows, next_cursor=next_cursor)
+
+        return await response_cache.respond(
+            request, "floats",
+            {"lat_min": lat_min, "lat_max": lat_max, "lon_min": lon_min, "lon_max": lon_max, "limit": limit,
+             "cursor": cursor, "format": fmt},
+            compute,
+            media_type=MEDIA_TYPES[fmt],
+            headers=download_headers(fmt, "floats"),
+        )
+    except (PoolExhaustedError, HTTPException):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/floats/search")
+async def search_floats(
+    request: Request,
+    lat: Optional[float] = Query(None, description="Latitude of the search centre"),
+    lon: Optional[float] = Query(None, description="Longitude of the search centre"),
+    radius_km: Optional[float] = Query(None, description="Search radius in km"),
+    polygon: Optional[str] = Query(None, description="Polygon as 'lon,lat;lon,lat;lon,lat[;...]'"),
+    match: str = Query("track", description="track (any profile) or last_position"),
+    limit: int = Query(50, description="Maximum number of floats"),
+    format: Optional[str] = Query(None, description="json (default) or columnar")
+):
+    """Find floats within `radius_km` of (lat, lon), nearest first, or inside `polygon`
+
+    Uses ST_DWithin / ST_Intersects on geography, backed by the GIST
+    expression indexes on float_summary, so distances are in metres on the
+    sphere and searches across the antimeridian need no special handling.
     """
+    if match not in MATCH_COLUMNS:
+        raise HTTPException(status_code=400, detail="match must be track or last_position")
+    column = MATCH_COLUMNS[match]
+    fmt = negotiate(request, format)
+    if fmt not in ("json", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be json or columnar")
+
+    if polygon and radius_km is None:
+        condition, params = polygon_condition(column, parse_polygon(polygon))
+        query = f"""
+        SELECT {FLOAT_SUMMARY_COLUMNS} FROM float_summary
+        WHERE {condition}
+        ORDER BY first_observation DESC, float_id DESC
+        LIMIT %s
+        """
+    elif lat is not None and lon is not None and radius_km is not None and not polygon:
+        condition, params = radius_condition(column, lat, lon, radius_km)
+        query = f"""
+        SELECT {FLOAT_SUMMARY_COLUMNS}, {distance_km(column)} AS distance_km
+        FROM float_summary
+        WHERE {condition}
+        ORDER BY distance_km, float_id
+        LIMIT %s
+        """
+        params = params[:2] + params
+    else:
+        raise HTTPException(status_code=400, detail="Give either lat, lon and radius_km, or polygon")
     params.append(limit)
-    
+
+    try:
+        async def compute():
+            if fmt == "columnar":
+                names, _, rows = await run_db(fetch_columns, query, params)
+                return columnar_json(names, rows)
+            return {"floats": await run_db(fetch_all, query, params)}
+
+        return await response_cache.respond(
+            request, "floats/search",
+            {"lat": lat, "lon": lon, "radius_km": radius_km, "polygon": polygon, "match": match,
+             "limit": limit, "format": fmt},
+            compute,
+            media_type=MEDIA_TYPES[fmt],
+        )
+    except (PoolExhaustedError, HTTPException):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/map/grid")
+async def get_map_grid(
+    request: Request,
+    zoom: int = Query(..., description="Grid zoom: cells are 360 / 2**zoom degrees wide (map zoom + 3 gives ~32 px cells)"),
+    var: Optional[str] = Query(None, description="temperature, salinity or pressure; float positions when omitted"),
+    lat_min: Optional[float] = Query(None, description="Minimum latitude"),
+    lat_max: Optional[float] = Query(None, description="Maximum latitude"),
+    lon_min: Optional[float] = Query(None, description="Minimum longitude"),
+    lon_max: Optional[float] = Query(None, description="Maximum longitude"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD), value layers only"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD), value layers only"),
+    depth_band: Optional[str] = Query(None, description="Depth band label, e.g. 0-10, value layers only"),
+    format: Optional[str] = Query(None, description="json (default) or columnar")
+):
+    """Map aggregates per grid cell for the visible bounds
+
+    Without `var`, the latest position of every float grouped into cells
+    (count, centroid, float_id when a cell holds one float). With `var`, the
+    mean value and observation count per cell from map_grid; zooms finer than
+    the stored grid are served at the stored grid, reported as `zoom`.
+    The number of cells is bounded by the zoom, not by the data.
+    """
+    if var is not None and var not in ("temperature", "salinity", "pressure"):
+        raise HTTPException(status_code=400, detail="Variable must be temperature, salinity, or pressure")
+    await check_depth_band(depth_band)
+    fmt = negotiate(request, format)
+    if fmt not in ("json", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be json or columnar")
+
+    if var is not None:
+        zoom = min(zoom, GRID_ZOOM)
+    ranges = cell_ranges(zoom, lat_min, lat_max, lon_min, lon_max)
+    if var is None:
+        query, params = floats_query(zoom, ranges)
+    else:
+        query, params = values_query(zoom, ranges, var, start_date, end_date, depth_band)
+
+    def fetch_cells(fetch=fetch_all):
+        try:
+            return fetch(query, params)
+        except psycopg2.errors.UndefinedTable:
+            table = "map_grid" if var else "float_summary"
+            raise HTTPException(
+                status_code=503,
+                detail=f"{table} has not been built yet (python scripts/{table}.py rebuild)",
+            )
+
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(query, params)
-                results = cur.fetchall()
-                return {"floats": results}
+        async def compute():
+            extra = {"zoom": zoom, "cell_size": cell_size(zoom), "variable": var}
+            if fmt == "columnar":
+                names, _, rows = await run_db(fetch_cells, fetch_columns)
+                return columnar_json(names, rows, **extra)
+            return dict(extra, cells=await run_db(fetch_cells))
+
+        # Bounds are keyed by the cells they snap to, so small pans reuse the entry
+        return await response_cache.respond(
+            request, "map/grid",
+            {"zoom": zoom, "cells": ranges_key(ranges), "var": var, "start_date": start_date if var else None,
+             "end_date": end_date if var else None, "depth_band": depth_band if var else None, "format": fmt},
+            compute,
+            media_type=MEDIA_TYPES[fmt],
+        )
+    except (PoolExhaustedError, HTTPException):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def answer_question(question):
+    with get_db_connection() as conn:
+        return process_question(question, conn)
+
 @app.post("/ask")
 async def ask_question(question_data: dict):
     """AI endpoint - processes natural language questions and returns natural language answers"""
@@ -168,126 +479,11 @@ async def ask_question(question_data: dict):
     if not question:
         raise HTTPException(status_code=400, detail="Question is required")
     
-    def generate_natural_language_response(question, data, sql):
-        """Convert SQL results into natural language responses"""
-        
-        question_lower = question.lower()
-        
-        if not data:
-            return "I couldn't find any data matching your question."
-        
-        # Generate responses based on question type and data
-        if "average" in question_lower and "temperature" in question_lower:
-            temp = data[0].get('average_temperature', 0)
-            return f"The average ocean temperature from ARGO float data is {temp:.2f}°C."
-            
-        elif "how many" in question_lower or "count" in question_lower:
-            count = data[0].get('total_floats', 0)
-            return f"There are {count} ARGO floats in the database."
-            
-        elif "float" in question_lower and ("position" in question_lower or "location" in question_lower):
-            if len(data) > 1:
-                return f"I found {len(data)} ARGO float positions. The data shows floats distributed across various ocean locations with coordinates ranging from the first few entries."
-            else:
-                return "I found one float position in the data."
-                
-        elif "temperature" in question_lower:
-            if len(data) > 1:
-                return f"I found {len(data)} temperature readings. The most recent measurements show temperatures ranging across different ocean depths and locations."
-            elif len(data) == 1:
-                temp = data[0].get('temperature')
-                time = data[0].get('time', 'unknown time')
-                return f"The temperature reading is {temp}°C recorded at {time}."
-            
-        elif "salinity" in question_lower:
-            if len(data) > 1:
-                return f"I found {len(data)} salinity measurements from the ARGO float network, showing the salt content distribution across different ocean areas."
-            elif len(data) == 1:
-                sal = data[0].get('salinity')
-                return f"The salinity measurement is {sal} PSU (Practical Salinity Units)."
-                
-        elif "pressure" in question_lower:
-            if len(data) > 1:
-                return f"I retrieved {len(data)} pressure readings, which indicate depth measurements at various ocean locations."
-            elif len(data) == 1:
-                press = data[0].get('pressure')
-                return f"The pressure reading is {press} dbar, indicating ocean depth."
-                
-        elif "recent" in question_lower or "latest" in question_lower:
-            return f"Here are the {len(data)} most recent observations from the ARGO float database, showing the latest oceanographic measurements."
-            
-        elif "deep" in question_lower:
-            return f"I found {len(data)} deep ocean measurements (pressure > 100 dbar), representing data from deeper water levels."
-            
-        elif "surface" in question_lower:
-            return f"I found {len(data)} surface-level measurements (pressure < 10 dbar), representing near-surface ocean conditions."
-            
-        else:
-            return f"I found {len(data)} records matching your question. The data includes various oceanographic measurements from ARGO floats."
-    
-    def process_nlp_query(question, db_connection):
-        """Process NLP query and return results with natural language response"""
-        
-        question_lower = question.lower()
-        
-        # SQL mapping logic
-        if "average" in question_lower and "temperature" in question_lower:
-            sql = "SELECT AVG(temperature) as average_temperature FROM argo_profiles WHERE temperature IS NOT NULL"
-        elif "temperature" in question_lower and ("time" in question_lower or "over" in question_lower):
-            sql = "SELECT DATE(time) as date, AVG(temperature) as avg_temp FROM argo_profiles WHERE temperature IS NOT NULL GROUP BY DATE(time) ORDER BY date DESC LIMIT 10"
-        elif "temperature" in question_lower:
-            sql = "SELECT time, temperature, lat, lon FROM argo_profiles WHERE temperature IS NOT NULL ORDER BY time DESC LIMIT 10"
-        elif "salinity" in question_lower:
-            sql = "SELECT time, salinity, lat, lon FROM argo_profiles WHERE salinity IS NOT NULL ORDER BY time DESC LIMIT 10"
-        elif "float" in question_lower and ("position" in question_lower or "location" in question_lower):
-            sql = "SELECT DISTINCT float_id, AVG(lat) as avg_lat, AVG(lon) as avg_lon FROM argo_profiles GROUP BY float_id LIMIT 10"
-        elif "pressure" in question_lower:
-            sql = "SELECT time, pressure, lat, lon FROM argo_profiles WHERE pressure IS NOT NULL ORDER BY time DESC LIMIT 10"
-        elif "deep" in question_lower or "depth" in question_lower:
-            sql = "SELECT * FROM argo_profiles WHERE pressure > 100 ORDER BY pressure DESC LIMIT 10"
-        elif "surface" in question_lower:
-            sql = "SELECT * FROM argo_profiles WHERE pressure < 10 ORDER BY time DESC LIMIT 10"
-        elif "how many" in question_lower or "count" in question_lower:
-            sql = "SELECT COUNT(DISTINCT float_id) as total_floats FROM argo_profiles"
-        elif "recent" in question_lower or "latest" in question_lower:
-            sql = "SELECT * FROM argo_profiles ORDER BY time DESC LIMIT 10"
-        else:
-            sql = "SELECT * FROM argo_profiles ORDER BY time DESC LIMIT 5"
-        
-        try:
-            from psycopg2.extras import RealDictCursor
-            
-            with db_connection.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(sql)
-                rows = cursor.fetchall()
-                data = [dict(row) for row in rows] if rows else []
-                
-                # Generate natural language response
-                natural_response = generate_natural_language_response(question, data, sql)
-                
-                return {
-                    "question": question,
-                    "sql": sql,
-                    "data": data,
-                    "success": True,
-                    "row_count": len(data),
-                    "natural_language_response": natural_response
-                }
-        except Exception as e:
-            return {
-                "question": question,
-                "sql": sql,
-                "data": [],
-                "success": False,
-                "error": str(e),
-                "natural_language_response": f"I encountered an error while processing your question: {str(e)}"
-            }
-    
     try:
-        with get_db_connection() as conn:
-            result = process_nlp_query(question, conn)
-            return result
-            
+        return await run_db(answer_question, question)
+
+    except PoolExhaustedError:
+        raise
     except Exception as e:
         return {
             "question": question,
@@ -329,22 +525,23 @@ async def test_nlp_endpoint():
 async def health_check():
     """Health check endpoint to verify database connection"""
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM argo_profiles")
-                count = cur.fetchone()[0]  # Fixed: use [0] instead of ['count']
-                return {
-                    "status": "healthy",
-                    "database": "connected", 
-                    "total_records": count,
-                    "nlp_status": "integrated"
-                }
+        rows = await run_db(fetch_all, "SELECT COUNT(*) FROM argo_profiles")
+        return {
+            "status": "healthy",
+            "database": "connected",
+            "total_records": rows[0]["count"],
+            "nlp_status": "integrated",
+            "db_pool": db_pool.stats(),
+            "response_cache": response_cache.stats(),
+            "plan_cache": intent_engine.plan_cache.stats()
+        }
     except Exception as e:
         return {
             "status": "unhealthy",
             "database": "disconnected",
             "error": str(e),
-            "nlp_status": "unknown"
+            "nlp_status": "unknown",
+            "db_pool": db_pool.stats()
         }
 
 if __name__ == "__main__":
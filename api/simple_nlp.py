@@ -1,51 +1,55 @@
+import os
+import sys
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# The intent engine lives with the rest of the NLP code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "nlp"))
+
+from intents import intent_engine  # noqa: E402
+
+
 def process_question(question, db_connection):
     """Simple NLP that converts questions to SQL and executes them"""
     
-    question_lower = question.lower()
-    
-    # Map questions to SQL queries
-    if "average" in question_lower and "temperature" in question_lower:
-        sql = "SELECT AVG(temperature) as average_temperature FROM argo_profiles WHERE temperature IS NOT NULL"
-    elif "temperature" in question_lower and ("time" in question_lower or "over" in question_lower):
-        sql = "SELECT DATE(time) as date, AVG(temperature) as avg_temp FROM argo_profiles WHERE temperature IS NOT NULL GROUP BY DATE(time) ORDER BY date DESC LIMIT 10"
-    elif "temperature" in question_lower:
-        sql = "SELECT time, temperature, lat, lon FROM argo_profiles WHERE temperature IS NOT NULL ORDER BY time DESC LIMIT 10"
-    elif "salinity" in question_lower:
-        sql = "SELECT time, salinity, lat, lon FROM argo_profiles WHERE salinity IS NOT NULL ORDER BY time DESC LIMIT 10"
-    elif "float" in question_lower and ("position" in question_lower or "location" in question_lower):
-        sql = "SELECT DISTINCT float_id, AVG(lat) as avg_lat, AVG(lon) as avg_lon FROM argo_profiles GROUP BY float_id LIMIT 10"
-    elif "pressure" in question_lower:
-        sql = "SELECT time, pressure, lat, lon FROM argo_profiles WHERE pressure IS NOT NULL ORDER BY time DESC LIMIT 10"
-    elif "deep" in question_lower or "depth" in question_lower:
-        sql = "SELECT * FROM argo_profiles WHERE pressure > 100 ORDER BY pressure DESC LIMIT 10"
-    elif "surface" in question_lower:
-        sql = "SELECT * FROM argo_profiles WHERE pressure < 10 ORDER BY time DESC LIMIT 10"
-    elif "how many" in question_lower or "count" in question_lower:
-        sql = "SELECT COUNT(DISTINCT float_id) as total_floats FROM argo_profiles"
-    elif "recent" in question_lower or "latest" in question_lower:
-        sql = "SELECT * FROM argo_profiles ORDER BY time DESC LIMIT 10"
-    else:
-        sql = "SELECT * FROM argo_profiles ORDER BY time DESC LIMIT 5"
+    # Map questions to SQL queries (compiled once, see nlp/intents.py), with
+    # float ids, dates, depths and regions bound as parameters; questions
+    # already seen in another wording come from the plan cache
+    plan = intent_engine.plan(question)
+    intent, sql = plan.intent, plan.sql
     
     try:
-        with db_connection.cursor() as cursor:
-            cursor.execute(sql)
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            data = [dict(zip(columns, row)) for row in rows]
+        with db_connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            try:
+                cursor.execute(sql, plan.params)
+            except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn,
+                    psycopg2.errors.UndefinedFunction):
+                # No float_summary track (or PostGIS) yet: filter regions on lat/lon only
+                db_connection.rollback()
+                sql, params = intent.render(plan.entities, use_float_summary=False)
+                cursor.execute(sql, params)
+            data = [dict(row) for row in cursor.fetchall()]
             
             return {
                 "question": question,
+                "intent": intent.name,
+                "plan_cached": plan.cached,
                 "sql": sql,
+                "params": plan.params,
                 "data": data,
                 "success": True,
-                "row_count": len(data)
+                "row_count": len(data),
+                "natural_language_response": plan.describe(data)
             }
     except Exception as e:
         return {
             "question": question,
+            "intent": intent.name,
             "sql": sql,
+            "params": plan.params,
             "data": [],
             "success": False,
-            "error": str(e)
+            "error": str(e),
+            "natural_language_response": f"I encountered an error while processing your question: {str(e)}"
         }
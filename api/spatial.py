@@ -0,0 +1,114 @@
+"""
+Spatial filters on float_summary for /floats and /floats/search.
+
+Boxes become ST_MakeEnvelope() predicates that the GIST index on
+float_summary.track answers; a box whose lon_min is greater than its lon_max
+crosses the antimeridian and is split into two envelopes (lon_min..180 and
+-180..lon_max). Radius and polygon searches cast to geography, which measures
+in metres on the sphere and needs no special dateline handling; the
+expression indexes on track::geography and last_position::geography back
+them.
+
+  python spatial.py   checks how bounds map to envelopes
+"""
+
+from fastapi import HTTPException
+
+SRID = 4326
+# What a search matches against: any profile position or only the latest one
+MATCH_COLUMNS = {"track": "track", "last_position": "last_position"}
+
+
+def normalize_lon(lon):
+    """Map longitudes given as 0..360 (or beyond) into -180..180."""
+    if lon is None or -180 <= lon <= 180:
+        return lon
+    return (lon + 180) % 360 - 180
+
+
+def _check_lat(value, name):
+    if value is not None and not -90 <= value <= 90:
+        raise HTTPException(status_code=400, detail=f"{name} must be between -90 and 90")
+
+
+def envelopes(lat_min=None, lat_max=None, lon_min=None, lon_max=None):
+    """(xmin, ymin, xmax, ymax) boxes covering the bounds; two when they cross the antimeridian."""
+    for value, name in ((lat_min, "lat_min"), (lat_max, "lat_max")):
+        _check_lat(value, name)
+    lat_min = -90.0 if lat_min is None else lat_min
+    lat_max = 90.0 if lat_max is None else lat_max
+    if lat_min > lat_max:
+        raise HTTPException(status_code=400, detail="lat_min must not be greater than lat_max")
+    if lon_min is not None and lon_max is not None and lon_max - lon_min >= 360:
+        # A whole turn (0..360, 10..370): normalizing each bound would collapse it to a strip
+        lon_min, lon_max = None, None
+    lon_min = -180.0 if lon_min is None else normalize_lon(lon_min)
+    lon_max = 180.0 if lon_max is None else normalize_lon(lon_max)
+    if lon_min <= lon_max:
+        return [(lon_min, lat_min, lon_max, lat_max)]
+    return [(lon_min, lat_min, 180.0, lat_max), (-180.0, lat_min, lon_max, lat_max)]
+
+
+def bbox_condition(column, lat_min=None, lat_max=None, lon_min=None, lon_max=None):
+    """SQL predicate and params matching rows whose `column` geometry intersects the bounds."""
+    parts, params = [], []
+    for box in envelopes(lat_min, lat_max, lon_min, lon_max):
+        parts.append(f"ST_Intersects({column}, ST_MakeEnvelope(%s, %s, %s, %s, {SRID}))")
+        params.extend(box)
+    return "(" + " OR ".join(parts) + ")", params
+
+
+def parse_polygon(value):
+    """WKT POLYGON for 'lon,lat;lon,lat;...' (at least three vertices; the ring is closed here)."""
+    try:
+        vertices = [tuple(float(c) for c in pair.split(",")) for pair in value.split(";") if pair.strip()]
+    except ValueError:
+        vertices = []
+    if len(vertices) < 3 or any(len(v) != 2 for v in vertices):
+        raise HTTPException(status_code=400, detail="polygon must be 'lon,lat;lon,lat;lon,lat[;...]'")
+    for lon, lat in vertices:
+        _check_lat(lat, "polygon latitude")
+    ring = [(normalize_lon(lon), lat) for lon, lat in vertices]
+    if ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return "POLYGON((" + ", ".join(f"{lon!r} {lat!r}" for lon, lat in ring) + "))"
+
+
+def radius_condition(column, lat, lon, radius_km):
+    """Index-backed ST_DWithin on geography; params are (lon, lat, metres)."""
+    _check_lat(lat, "lat")
+    if radius_km <= 0:
+        raise HTTPException(status_code=400, detail="radius_km must be positive")
+    sql = f"ST_DWithin({column}::geography, ST_SetSRID(ST_MakePoint(%s, %s), {SRID})::geography, %s)"
+    return sql, [normalize_lon(lon), lat, radius_km * 1000.0]
+
+
+def distance_km(column):
+    """SQL expression for the distance in km from `column` to ST_MakePoint(%s, %s)."""
+    return f"ST_Distance({column}::geography, ST_SetSRID(ST_MakePoint(%s, %s), {SRID})::geography) / 1000.0"
+
+
+def polygon_condition(column, wkt):
+    return f"ST_Intersects({column}::geography, ST_GeogFromText(%s))", [f"SRID={SRID};{wkt}"]
+
+
+if __name__ == "__main__":
+    WORLD = [(-180.0, -90.0, 180.0, 90.0)]
+    CASES = [
+        ({}, WORLD),
+        ({"lon_min": -180, "lon_max": 180}, WORLD),
+        ({"lon_min": 0, "lon_max": 360}, WORLD),
+        ({"lon_min": 10, "lon_max": 370}, WORLD),
+        ({"lon_min": 70, "lon_max": 80}, [(70, -90.0, 80, 90.0)]),
+        ({"lon_min": 170, "lon_max": -170}, [(170, -90.0, 180.0, 90.0), (-180.0, -90.0, -170, 90.0)]),
+        ({"lon_min": 180, "lon_max": 360}, [(180, -90.0, 180.0, 90.0), (-180.0, -90.0, 0, 90.0)]),
+        ({"lon_min": 0, "lon_max": 200}, [(0, -90.0, 180.0, 90.0), (-180.0, -90.0, -160, 90.0)]),
+        ({"lat_min": -10, "lat_max": 10, "lon_min": 190, "lon_max": 350}, [(-170, -10, -10, 10)]),
+    ]
+    failed = 0
+    for bounds, expected in CASES:
+        got = envelopes(**bounds)
+        ok = got == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {bounds} -> {got}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,88 @@
+"""
+Keyset pagination cursors and NDJSON streaming for the data endpoints.
+
+A page ends with `next_cursor`, an opaque token holding the sort key of its
+last row; passing it back as `cursor` continues with a "(key) > (last key)"
+predicate, so every page is an index range scan no matter how deep the
+client has paged, and rows inserted meanwhile never shift the pages.
+
+With `format=ndjson` (or `Accept: application/x-ndjson`) the endpoint
+instead streams every matching row, one JSON object per line, from a
+server-side cursor, so memory stays flat however large the result is.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import iter_rows, run_db
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Rows encoded per chunk written to the socket
+NDJSON_CHUNK_ROWS = 500
+
+
+def encode_cursor(*values):
+    """Opaque page token for the sort key of the last row returned."""
+    values = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Sort-key values from a token made by encode_cursor(); 400 if it is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (binascii.Error, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def page(rows, limit, key):
+    """Split a LIMIT limit+1 result into (rows, next_cursor); next_cursor is None on the last page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def json_default(value):
+    """json.dumps fallback for the date/time and numeric types psycopg2 returns."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _ndjson_chunks(first, rows):
+    dumps = json.JSONEncoder(default=json_default, separators=(",", ":")).encode
+    yield (dumps(first) + "\n").encode()
+    while True:
+        batch = list(islice(rows, NDJSON_CHUNK_ROWS))
+        if not batch:
+            return
+        yield "".join(dumps(row) + "\n" for row in batch).encode()
+
+
+async def ndjson_response(query, params, not_found=None):
+    """Stream the rows of `query` as NDJSON from a server-side cursor.
+
+    The query runs and its first row is fetched before the response starts,
+    so a missing result (404 when `not_found` is given), a busy pool or an SQL
+    error still produce a proper error status instead of a truncated stream.
+    """
+    rows = iter_rows(query, params)
+    first = await run_db(next, rows, None)
+    if first is None:
+        if not_found:
+            raise HTTPException(status_code=404, detail=not_found)
+        return StreamingResponse(iter(()), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_ndjson_chunks(first, rows), media_type=NDJSON_MEDIA_TYPE)
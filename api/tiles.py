@@ -0,0 +1,127 @@
+"""
+Zoom-dependent grid aggregates for the maps (/map/grid).
+
+The world is cut into square cells 360 / 2**zoom degrees wide, numbered from
+(-180, -90): cell_x = floor((lon + 180) / size), cell_y = floor((lat + 90) / size).
+Each cell at zoom z is exactly four cells of zoom z + 1, so the value layers
+are summed from the finest level precomputed in map_grid (GRID_ZOOM, see
+scripts/map_grid.py) by shifting cell numbers, and the float layer groups the
+fleet-sized float_summary on the fly.
+
+Requested bounds are snapped outward to whole cells: a response never holds
+more than 2**zoom * 2**(zoom - 1) cells however much data there is, and every
+view covering the same cells shares one cache entry.
+"""
+
+import math
+
+from fastapi import HTTPException
+
+from spatial import envelopes
+
+# Finest zoom stored in map_grid (must match GRID_ZOOM in scripts/map_grid.py)
+GRID_ZOOM = 8
+# The float layer is computed per request and can go down to single floats
+MAX_ZOOM = 16
+
+
+def cell_size(zoom):
+    return 360.0 / 2 ** zoom
+
+
+def grid_shape(zoom):
+    """(columns, rows) of the grid at `zoom`."""
+    return 2 ** zoom, max(1, 2 ** zoom // 2)
+
+
+def _cell(offset, size, count):
+    return min(max(int(math.floor(offset / size)), 0), count - 1)
+
+
+def cell_ranges(zoom, lat_min=None, lat_max=None, lon_min=None, lon_max=None):
+    """[(x0, x1, y0, y1)] inclusive cell ranges covering the bounds; two across the antimeridian."""
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"zoom must be between 0 and {MAX_ZOOM}")
+    size = cell_size(zoom)
+    columns, rows = grid_shape(zoom)
+    return [
+        (_cell(xmin + 180, size, columns), _cell(xmax + 180, size, columns),
+         _cell(ymin + 90, size, rows), _cell(ymax + 90, size, rows))
+        for xmin, ymin, xmax, ymax in envelopes(lat_min, lat_max, lon_min, lon_max)
+    ]
+
+
+def ranges_key(ranges):
+    """Cache key part for the snapped bounds, e.g. '12-20,3-9'."""
+    return ";".join(f"{x0}-{x1},{y0}-{y1}" for x0, x1, y0, y1 in ranges)
+
+
+def cell_condition(x, y, ranges, shift=0):
+    """SQL predicate (and params) restricting the cell expressions x, y to `ranges`.
+
+    With `shift`, the ranges are given at a zoom `shift` levels coarser than
+    x and y, and are widened to the finer cells they contain.
+    """
+    parts, params = [], []
+    for x0, x1, y0, y1 in ranges:
+        parts.append(f"({x} BETWEEN %s AND %s AND {y} BETWEEN %s AND %s)")
+        params.extend([x0 << shift, ((x1 + 1) << shift) - 1, y0 << shift, ((y1 + 1) << shift) - 1])
+    return "(" + " OR ".join(parts) + ")", params
+
+
+def floats_query(zoom, ranges):
+    """Latest float positions grouped into cells: count, centroid and the float_id of lone floats."""
+    size = cell_size(zoom)
+    columns, rows = grid_shape(zoom)
+    condition, params = cell_condition("cell_x", "cell_y", ranges)
+    query = f"""
+    SELECT cell_x, cell_y,
+           COUNT(*) AS count,
+           AVG(last_lat) AS lat,
+           AVG(lon) AS lon,
+           CASE WHEN COUNT(*) = 1 THEN MIN(float_id) END AS float_id,
+           MAX(last_observation) AS last_observation
+    FROM (
+        SELECT float_id, last_lat, lon, last_observation,
+               LEAST(floor((lon + 180) / %s)::int, %s) AS cell_x,
+               LEAST(floor((last_lat + 90) / %s)::int, %s) AS cell_y
+        FROM (
+            SELECT float_id, last_lat, last_lon - 360 * floor((last_lon + 180) / 360) AS lon, last_observation
+            FROM float_summary
+            WHERE last_lat IS NOT NULL AND last_lon IS NOT NULL
+        ) positions
+    ) cells
+    WHERE {condition}
+    GROUP BY cell_x, cell_y
+    ORDER BY cell_x, cell_y
+    """
+    return query, [size, columns - 1, size, rows - 1] + params
+
+
+def values_query(zoom, ranges, var, start_date=None, end_date=None, depth_band=None):
+    """Mean of `var` per cell from map_grid, re-aggregated from GRID_ZOOM to `zoom`."""
+    shift = GRID_ZOOM - zoom
+    conditions, params = ["variable = %s"], [var]
+    if start_date:
+        conditions.append("day >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("day <= %s")
+        params.append(end_date)
+    if depth_band:
+        conditions.append("depth_band = (SELECT band FROM depth_bands WHERE label = %s)")
+        params.append(depth_band)
+    condition, cell_params = cell_condition("cell_x", "cell_y", ranges, shift)
+    conditions.append(condition)
+    query = f"""
+    SELECT cell_x >> {shift} AS cell_x, cell_y >> {shift} AS cell_y,
+           CAST(SUM(value_count) AS BIGINT) AS count,
+           SUM(lat_sum) / SUM(value_count) AS lat,
+           SUM(lon_sum) / SUM(value_count) AS lon,
+           SUM(value_sum) / SUM(value_count) AS mean_value
+    FROM map_grid
+    WHERE {" AND ".join(conditions)}
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    """
+    return query, params + cell_params
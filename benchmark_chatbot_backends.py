@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Compares the chatbot inference backends (inference_backends.py) with the
+float32 baseline on the CPU: load time, answer latency, peak RSS, and how
+often the answers agree with float32's.
+
+Each backend runs in its own child process so peak RSS is its own. Latency
+is per question (batch of 1, greedy, max_new_tokens as in the server) and
+for one padded batch of all sample questions, after a warm-up. RSS is the
+process peak and the part of it added by loading, converting and running
+the model (torch itself accounts for most of the rest). Agreement is the
+share of answers identical to float32's and the mean share of words
+matching position by position.
+
+By default a tiny randomly initialised GPT-2 (tiny_model.py) stands in for
+./ocean_chatbot_final; pass --model to benchmark a real checkpoint.
+
+Usage:
+  python benchmark_chatbot_backends.py [--backends fp32 int8 bf16 compile onnx]
+                                       [--model ./ocean_chatbot_final]
+                                       [--layers 4] [--hidden 384] [--repeats 3] [--threads 4]
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from inference_backends import BACKENDS
+
+
+def run_backend(args):
+    """Child process: load, convert, time and answer; prints one JSON line."""
+    import torch
+
+    import ai_chatbot_server
+    from inference_backends import apply_backend, load_chat_model
+    from tiny_model import SAMPLE_QUESTIONS, build_tiny_model
+
+    torch.set_num_threads(args.threads)
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if args.model:
+        model, tokenizer, backend = load_chat_model(args.model, args.worker)
+    else:
+        model, tokenizer = build_tiny_model(layers=args.layers, hidden=args.hidden)
+        model, backend = apply_backend(model, args.worker)
+    ai_chatbot_server.model, ai_chatbot_server.tokenizer = model, tokenizer
+    # Warm-up; compile builds a graph per input shape family
+    ai_chatbot_server.answer_batch(SAMPLE_QUESTIONS[:1])
+    ai_chatbot_server.answer_batch(SAMPLE_QUESTIONS)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    answers = []
+    for _ in range(args.repeats):
+        for question in SAMPLE_QUESTIONS:
+            start = time.perf_counter()
+            answer = ai_chatbot_server.ask_ocean_question(question)
+            latencies.append(time.perf_counter() - start)
+            if len(answers) < len(SAMPLE_QUESTIONS):
+                answers.append(answer)
+    start = time.perf_counter()
+    ai_chatbot_server.answer_batch(SAMPLE_QUESTIONS)
+    batch_seconds = time.perf_counter() - start
+
+    latencies.sort()
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_seconds,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "batch_ms": batch_seconds * 1000,
+        "rss_mb": peak_rss_mb(),
+        "model_rss_mb": peak_rss_mb() - rss_before,
+        "answers": answers,
+    }))
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def agreement(answers, baseline):
+    same = sum(a == b for a, b in zip(answers, baseline)) / len(baseline)
+    words = []
+    for a, b in zip(answers, baseline):
+        a, b = a.split(), b.split()
+        longest = max(len(a), len(b))
+        words.append(sum(x == y for x, y in zip(a, b)) / longest if longest else 1.0)
+    return same, statistics.mean(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--model", help="checkpoint directory (default: tiny random stand-in)")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=384)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4, help="torch intra-op threads")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_backend(args)
+
+    backends = ["fp32"] + [b for b in args.backends if b != "fp32"]
+    passthrough = [f"--layers={args.layers}", f"--hidden={args.hidden}", f"--repeats={args.repeats}", f"--threads={args.threads}"]
+    if args.model:
+        passthrough.append(f"--model={args.model}")
+    model = args.model or f"tiny GPT-2 ({args.layers} layers, hidden {args.hidden})"
+    print(f"{model}, {args.threads} torch threads, {args.repeats} passes over the sample questions")
+    print(f"{'backend':>8} | {'load s':>7} {'p50 ms':>8} {'p95 ms':>8} {'batch ms':>9} {'RSS MB':>7} {'model MB':>8} | "
+          f"{'speedup':>7} {'same answer':>11} {'same words':>10}")
+
+    baseline = None
+    for backend in backends:
+        child = subprocess.run([sys.executable, __file__, f"--worker={backend}", *passthrough], capture_output=True, text=True)
+        if child.returncode != 0:
+            error = (child.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{backend:>8} | failed: {error}")
+            continue
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        baseline = baseline or result
+        same, words = agreement(result["answers"], baseline["answers"])
+        label = backend if result["backend"] == backend else f"{backend}->{result['backend']}"
+        print(f"{label:>8} | {result['load_s']:>7.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+              f"{result['batch_ms']:>9.1f} {result['rss_mb']:>7.0f} {result['model_rss_mb']:>8.0f} | {baseline['p50_ms'] / result['p50_ms']:>6.2f}x "
+              f"{same:>11.0%} {words:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+CPU throughput of the chatbot server (ai_chatbot_server.py) with and without
+dynamic batching, as a function of how many clients ask at once.
+
+A tiny randomly initialised GPT-2 (tiny_model.py) stands in for
+./ocean_chatbot_final, so this runs anywhere torch and transformers are
+installed. For each concurrency level, that many client threads send
+questions through the BatchingWorker until --requests answers have come
+back; "unbatched" is the same worker with max_batch_size=1 (one generate
+call per question, the old behaviour). Reported: questions/s, median and
+p95 latency, and the mean batch size the worker actually formed.
+
+Usage:
+  python benchmark_chatbot_batching.py [--concurrency 1 2 4 8 16] [--requests 64]
+                                       [--max-batch-size 8] [--max-wait-ms 20]
+                                       [--layers 2] [--hidden 128] [--threads 4]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import torch
+
+import ai_chatbot_server
+from inference_worker import BatchingWorker
+from tiny_model import SAMPLE_QUESTIONS, build_tiny_model
+
+
+def run_level(concurrency, requests, max_batch_size, max_wait_ms):
+    worker = BatchingWorker(ai_chatbot_server.answer_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms).start()
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            worker.submit(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]).result()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stats = worker.stats()
+    worker.stop()
+    latencies.sort()
+    return {
+        "qps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "batch": stats["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64, help="questions per concurrency level")
+    parser.add_argument("--max-batch-size", type=int, default=ai_chatbot_server.CHAT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=ai_chatbot_server.CHAT_MAX_WAIT_MS)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=128)
+    parser.add_argument("--threads", type=int, default=4, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    ai_chatbot_server.model, ai_chatbot_server.tokenizer = build_tiny_model(layers=args.layers, hidden=args.hidden)
+    ai_chatbot_server.answer_batch(SAMPLE_QUESTIONS[:2])  # warm-up
+
+    print(f"tiny GPT-2 ({args.layers} layers, hidden {args.hidden}), {args.requests} questions per level, "
+          f"max batch {args.max_batch_size}, max wait {args.max_wait_ms:g} ms, {args.threads} torch threads")
+    print(f"{'clients':>7} | {'unbatched q/s':>13} {'p50 ms':>8} {'p95 ms':>8} | "
+          f"{'batched q/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'batch':>5} | speedup")
+    for concurrency in args.concurrency:
+        single = run_level(concurrency, args.requests, 1, 0)
+        batched = run_level(concurrency, args.requests, args.max_batch_size, args.max_wait_ms)
+        print(f"{concurrency:>7} | {single['qps']:>13.1f} {single['p50_ms']:>8.1f} {single['p95_ms']:>8.1f} | "
+              f"{batched['qps']:>11.1f} {batched['p50_ms']:>8.1f} {batched['p95_ms']:>8.1f} "
+              f"{batched['batch']:>5.1f} | {batched['qps'] / single['qps']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Inference backends for the fine-tuned chatbot model (ai_chatbot_server.py,
+test_cpu_optimized.py).
+
+The model is always loaded in float32 first, so the [PAD] token can be added
+and the embeddings resized, and is then converted for the selected backend:
+
+  fp32     the float32 baseline
+  int8     dynamic int8 quantization of the linear layers: int8 weights,
+           activations quantized on the fly per batch
+  bf16     bfloat16 weights and activations; falls back to fp32 on CPUs
+           without native bfloat16 (AVX512-BF16 / AMX), where it is slower
+  compile  torch.compile'd forward pass (inductor graph, built on first use,
+           which takes a while)
+  onnx     exported to ONNX and run with ONNX Runtime (optional dependency:
+           pip install "optimum[onnxruntime]")
+
+GPT-2 style models keep their projections in transformers' Conv1D rather
+than nn.Linear; for int8 those are converted to nn.Linear first so dynamic
+quantization picks them up.
+
+Env:
+  CHAT_BACKEND  (fp32 | int8 | bf16 | compile | onnx, default: fp32)
+"""
+
+import os
+import tempfile
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+BACKENDS = ("fp32", "int8", "bf16", "compile", "onnx")
+CHAT_BACKEND = os.getenv("CHAT_BACKEND", "fp32")
+
+
+def prepare_tokenizer(model, tokenizer):
+    """Give the tokenizer its own [PAD] token (resizing the embeddings) and pad prompts on the left."""
+    if tokenizer.pad_token is None or tokenizer.pad_token == tokenizer.eos_token:
+        tokenizer.add_special_tokens({"pad_token": "[PAD]"})
+        model.resize_token_embeddings(len(tokenizer))
+    # Batched prompts are padded on the left so every row ends at "Bot:"
+    tokenizer.padding_side = "left"
+    return tokenizer
+
+
+def bf16_supported():
+    return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+
+
+def conv1d_to_linear(model):
+    """Swap transformers' Conv1D (GPT-2 family) for equivalent nn.Linear layers, in place."""
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                linear = torch.nn.Linear(child.weight.shape[0], child.nf)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+
+def to_onnx(model):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise RuntimeError('The onnx backend needs optimum[onnxruntime]: pip install "optimum[onnxruntime]"') from e
+    # Export the resized float32 model; the directory has to outlive the session
+    export_dir = tempfile.mkdtemp(prefix="chatbot-onnx-")
+    model.save_pretrained(export_dir)
+    return ORTModelForCausalLM.from_pretrained(export_dir, export=True, use_cache=True)
+
+
+def apply_backend(model, backend):
+    """Convert a float32 model for `backend`; returns (model, backend actually used)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "bf16":
+        if not bf16_supported():
+            print("⚠️ This CPU has no native bfloat16 support; using float32.")
+            return model, "fp32"
+        model = model.to(torch.bfloat16)
+    elif backend == "compile":
+        model.forward = torch.compile(model.forward, dynamic=True)
+    elif backend == "onnx":
+        model = to_onnx(model)
+    return model, backend
+
+
+def load_chat_model(path="./ocean_chatbot_final", backend=CHAT_BACKEND):
+    """(model, tokenizer, backend actually used) for the model at `path`."""
+    model = AutoModelForCausalLM.from_pretrained(
+        path,
+        dtype=torch.float32,
+        device_map="cpu",
+        low_cpu_mem_usage=True
+    )
+    tokenizer = prepare_tokenizer(model, AutoTokenizer.from_pretrained(path))
+    model.eval()
+    model, backend = apply_backend(model, backend)
+    return model, tokenizer, backend
@@ -0,0 +1,141 @@
+"""
+Background batching worker for the chatbot model (used by ai_chatbot_server.py).
+
+Requests go into a queue; a single worker thread takes the first waiting
+request, then keeps collecting until it has `max_batch_size` of them or
+`max_wait_ms` have passed, and hands the whole batch to `process_batch`
+(one padded model.generate call). Each caller gets its own result back
+through a Future, so concurrent users share forward passes instead of
+queueing behind each other, and the event loop never runs the model.
+
+Requests whose caller went away (cancelled futures) are dropped before the
+batch runs.
+
+Usage:
+  worker = BatchingWorker(answer_batch, max_batch_size=8, max_wait_ms=20)
+  worker.start()
+  answer = await worker.run("What is the salinity?")
+  worker.stop()
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+log = logging.getLogger("chatbot.worker")
+
+_STOP = object()
+
+
+class BatchingWorker:
+    """Groups queued items into batches for `process_batch(items) -> results` on one thread."""
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=20.0, name="inference-worker"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.cancelled = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish the batch in progress, fail whatever is still queued, and end the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Inference worker stopped"))
+
+    def submit(self, item):
+        """Queue one item; the returned Future resolves to its result."""
+        if self._thread is None:
+            raise RuntimeError("Inference worker is not running")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    async def run(self, item):
+        """submit() for async callers; cancelling the await drops the item if not yet started."""
+        return await asyncio.wrap_future(self.submit(item))
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Run what we have, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            live = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            with self._lock:
+                self.cancelled += len(batch) - len(live)
+            if not live:
+                continue
+            start = time.perf_counter()
+            try:
+                results = self.process_batch([item for item, _ in live])
+            except Exception as e:
+                log.exception("Batch of %d failed", len(live))
+                for _, future in live:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(live, results):
+                    future.set_result(result)
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - start
+                self.requests += len(live)
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, len(live))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._thread is not None,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queued": self._queue.qsize(),
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else None,
+                "largest_batch": self.largest_batch,
+                "cancelled": self.cancelled,
+                "busy_seconds": round(self.busy_seconds, 3),
+            }
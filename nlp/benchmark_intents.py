@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+nlp/benchmark_intents.py
+
+Throughput of the compiled intent engine (nlp/intents.py) on synthetic
+questions, next to the substring scan the old if/elif chains did: for every
+intent in turn, `keyword in question.lower()` for each of its keywords.
+Both walk the same registry, so the numbers compare the matching strategy
+alone. The share of questions on which the two pick different intents is
+printed too (word-prefix vs substring matching: "account" no longer counts
+as "count", nor "below" as "low"), as is the rate of full plans (intent
+plus entity extraction and SQL rendering, see nlp/entities.py), planned
+from scratch and through an in-memory plan cache (nlp/plan_cache.py). Entity
+extraction is timed on its own as well: both plan paths need it, so the
+time per question beyond it is what the cache can save.
+
+Usage:
+  python benchmark_intents.py [--questions 20000] [--repeats 5] [--seed 0]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from entities import extract_entities
+from intents import IntentEngine, intent_engine
+from plan_cache import PlanCache
+
+TEMPLATES = [
+    "What is the {adj} {topic}?",
+    "Show me {topic} {extra}",
+    "Give me {topic} data near the {place}",
+    "{extra} {topic} readings from float {float_id}",
+    "{topic} of float {float_id} in {month} {year} below {depth} dbar",
+    "{adj} {topic} in the {place} between {year}-01-01 and {year}-06-30",
+    "How many floats measured {topic} in the {place}?",
+    "Where are the floats with {adj} {topic}?",
+    "Plot {topic} over time for the {place}",
+    "Is the {place} {adj} this year compared to last?",
+]
+WORDS = {
+    "adj": ["average", "mean", "latest", "high", "low", "deep", "surface", "recent", "cold", "salty"],
+    "topic": ["temperature", "salinity", "pressure", "float positions", "profiles", "water", "ocean data"],
+    "extra": ["recent", "latest", "at depth", "near the surface", "this month", "in total", "please"],
+    "place": ["Arabian Sea", "Bay of Bengal", "Indian Ocean", "equator", "southern ocean"],
+    "month": ["January", "March", "Jul", "October"],
+    "year": ["2019", "2021", "2023"],
+    "depth": ["100", "500", "1000"],
+}
+
+
+def make_questions(count, seed):
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        fields = {name: rng.choice(options) for name, options in WORDS.items()}
+        fields["float_id"] = str(rng.randint(1900000, 7999999))
+        questions.append(rng.choice(TEMPLATES).format(**fields))
+    return questions
+
+
+def substring_match(question):
+    """The old chains' strategy over the same registry."""
+    q = question.lower()
+    for intent in intent_engine.intents:
+        if intent.keywords and all(any(k in q for k in group) for group in intent.keywords):
+            return intent
+    return intent_engine.default
+
+
+def measure(fn, questions, repeats):
+    rates = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for question in questions:
+            fn(question)
+        rates.append(len(questions) / (time.perf_counter() - start))
+    return statistics.median(rates)
+
+
+def measure_together(fns, questions, repeats):
+    """measure() for each of `fns`, taking turns within every repeat so load changes affect them alike."""
+    rates = [[] for _ in fns]
+    for _ in range(repeats):
+        for fn, fn_rates in zip(fns, rates):
+            start = time.perf_counter()
+            for question in questions:
+                fn(question)
+            fn_rates.append(len(questions) / (time.perf_counter() - start))
+    return [statistics.median(r) for r in rates]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions, args.seed)
+    compiled = measure(intent_engine.match, questions, args.repeats)
+    scan = measure(substring_match, questions, args.repeats)
+    plan_cache = PlanCache(path=None)
+    uncached_engine = IntentEngine(intent_engine.intents, default=intent_engine.default)
+    cached_engine = IntentEngine(intent_engine.intents, default=intent_engine.default, plan_cache=plan_cache)
+    extraction, plans, cached = measure_together(
+        [extract_entities, uncached_engine.plan, cached_engine.plan], questions, args.repeats
+    )
+    differ = sum(intent_engine.match(q) is not substring_match(q) for q in questions)
+
+    print(f"{len(intent_engine.intents)} intents, {len(questions):,} questions")
+    print(f"  compiled engine: {compiled:12,.0f} questions/s")
+    print(f"  substring scan:  {scan:12,.0f} questions/s")
+    print(f"  entity extraction: {extraction:10,.0f} questions/s")
+    print(f"  full plans:      {plans:12,.0f} questions/s "
+          f"({(1 / plans - 1 / extraction) * 1e6:.1f} us/question beyond extraction)")
+    stats = plan_cache.stats()
+    print(f"  cached plans:    {cached:12,.0f} questions/s "
+          f"({(1 / cached - 1 / extraction) * 1e6:.1f} us/question beyond extraction; "
+          f"{stats['entries']:,} distinct plans, hit rate {stats['hit_rate']:.1%})")
+    print(f"  different intent on {differ / len(questions):.1%} of questions")
+
+
+if __name__ == "__main__":
+    main()
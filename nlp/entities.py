@@ -0,0 +1,285 @@
+"""
+Entity extraction for the keyword NLP path: float ids, dates and date
+ranges, depth/pressure bounds, positions and named basins, and row limits.
+
+extract_entities() returns a plain dict; filter_conditions() turns it into
+SQL conditions on argo_profiles with pyformat parameters (%(name)s), chosen
+so that the lookups are index-backed:
+  - float_id = ...                   idx_argo_float_cycle
+  - time >= ... AND time < ...       idx_argo_time
+  - a region restricts float_id to the floats whose track intersects it,
+    via the GIST index on float_summary.track, before the lat/lon check
+    on the rows themselves
+
+Values are always bound as parameters, never formatted into the SQL.
+
+Usage:
+  entities = extract_entities("temperature of float 4903775 in March 2023 below 500 dbar")
+  conditions, params = filter_conditions(entities)
+"""
+
+import calendar
+import math
+import re
+from datetime import date, timedelta
+
+# Rows a question can ask for with "top 50", "first 20 rows" ...
+MAX_LIMIT = 1000
+# Radius around a position given without "within N km"
+DEFAULT_RADIUS_KM = 100.0
+
+# Approximate bounding boxes (lat_min, lat_max, lon_min, lon_max); lon_min > lon_max
+# crosses the antimeridian. Longer names are tried first, so "north atlantic" beats "atlantic".
+BASINS = {
+    "arabian sea": (0.0, 30.0, 45.0, 78.0),
+    "bay of bengal": (5.0, 23.0, 78.0, 100.0),
+    "andaman sea": (5.0, 20.0, 92.0, 100.0),
+    "laccadive sea": (0.0, 14.0, 70.0, 80.0),
+    "red sea": (12.0, 30.0, 32.0, 44.0),
+    "persian gulf": (23.0, 31.0, 47.0, 57.0),
+    "indian ocean": (-60.0, 30.0, 20.0, 147.0),
+    "southern ocean": (-90.0, -50.0, -180.0, 180.0),
+    "north atlantic": (0.0, 70.0, -80.0, 20.0),
+    "south atlantic": (-60.0, 0.0, -70.0, 20.0),
+    "atlantic": (-60.0, 70.0, -80.0, 20.0),
+    "north pacific": (0.0, 65.0, 120.0, -100.0),
+    "south pacific": (-60.0, 0.0, 145.0, -70.0),
+    "pacific": (-60.0, 65.0, 120.0, -70.0),
+    "mediterranean": (30.0, 46.0, -6.0, 36.0),
+    "equator": (-5.0, 5.0, -180.0, 180.0),
+}
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_UNIT = r"(?:dbar|db|decibars?|m|meters?|metres?)\b"
+# One date expression: 2023-03-15, March 2023 / Mar 2023, or 2023 (but not "2000 m")
+_DATE = rf"(?:\d{{4}}-\d{{1,2}}-\d{{1,2}}|(?:{_MONTH})\.?\s+\d{{4}}|(?:19|20)\d{{2}}(?![\d.]|\s*{_UNIT}))"
+_NUMBER = r"(\d+(?:\.\d+)?)"
+
+_FLOAT_ID = re.compile(r"\b(?:float|wmo|platform)\s*(?:id|number|no\.?|#)?\s*:?\s*(\d{5,8})\b")
+# WMO numbers of Argo floats are 7 digits
+_BARE_FLOAT_ID = re.compile(r"(?<![\d.-])([1-79]\d{6})(?![\d.])")
+_DATE_RANGE = re.compile(rf"\b(?:between|from)\s+({_DATE})\s+(?:and|to|until|-)\s+({_DATE})")
+_SINCE = re.compile(rf"\b(since|after|from)\s+({_DATE})")
+_UNTIL = re.compile(rf"\b(before|until|till|up to)\s+({_DATE})")
+_RELATIVE = re.compile(r"\b(?:last|past|previous)\s+(\d+)?\s*(day|week|month|year)s?\b")
+_ON_DATE = re.compile(rf"\b({_DATE})\b")
+_DEPTH_RANGE = re.compile(rf"\b(?:between|from)\s+{_NUMBER}\s*(?:{_UNIT})?\s*(?:and|to|-)\s*{_NUMBER}\s*{_UNIT}")
+_DEEPER = re.compile(rf"\b(?:below|deeper than|beneath|greater than|more than|over)\s+{_NUMBER}\s*{_UNIT}")
+_SHALLOWER = re.compile(rf"\b(?:above|shallower than|less than|within the top|top|upper)\s+{_NUMBER}\s*{_UNIT}")
+_BASIN = re.compile(r"\b(" + "|".join(re.escape(name) for name in sorted(BASINS, key=len, reverse=True)) + r")\b")
+_COORD = r"(-?\d+(?:\.\d+)?)\s*°?\s*"
+_LATLON_HEMI = re.compile(rf"{_COORD}([ns])\b[\s,/]*{_COORD}([ew])\b")
+_LATLON_NAMED = re.compile(r"\blat(?:itude)?\s*[=:]?\s*(-?\d+(?:\.\d+)?)[\s,]*lon(?:gitude)?\s*[=:]?\s*(-?\d+(?:\.\d+)?)")
+_RADIUS = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kilometers?|kilometres?|nm|nautical miles?)\b")
+_LIMIT = re.compile(r"\b(?:top|first|last|latest|show|list|give me)\s+(\d{1,5})\b(?!\s*(?:days?|weeks?|months?|years?|m\b|meters?|metres?|dbar|db\b|km))")
+_ROWS = re.compile(r"\b(\d{1,5})\s+(?:rows|records|readings|measurements|observations|profiles|results)\b")
+
+
+def _period(text):
+    """(first day, day after the last) of a date expression."""
+    text = text.strip().rstrip(".").replace(".", "")
+    if re.fullmatch(r"\d{4}-\d{1,2}-\d{1,2}", text):
+        day = date(*(int(part) for part in text.split("-")))
+        return day, day + timedelta(days=1)
+    if re.fullmatch(r"\d{4}", text):
+        year = int(text)
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    name, year = text.split()
+    month, year = MONTHS[name], int(year)
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+
+def _months_back(day, months):
+    month = day.month - 1 - months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _dates(q, today):
+    match = _DATE_RANGE.search(q)
+    if match:
+        return _period(match.group(1))[0], _period(match.group(2))[1]
+    match = _RELATIVE.search(q)
+    if match:
+        count, unit = int(match.group(1) or 1), match.group(2)
+        end = today + timedelta(days=1)
+        if unit == "day":
+            return end - timedelta(days=count), end
+        if unit == "week":
+            return end - timedelta(weeks=count), end
+        return _months_back(end, count * (12 if unit == "year" else 1)), end
+    start = end = None
+    match = _SINCE.search(q)
+    if match:
+        lo, hi = _period(match.group(2))
+        start = hi if match.group(1) == "after" else lo
+    match = _UNTIL.search(q)
+    if match:
+        lo, hi = _period(match.group(2))
+        end = lo if match.group(1) == "before" else hi
+    if start or end:
+        return start, end
+    match = _ON_DATE.search(q)
+    if match:
+        return _period(match.group(1))
+    return None, None
+
+
+def _region(q):
+    match = _BASIN.search(q)
+    if match:
+        return match.group(1), BASINS[match.group(1)]
+    match = _LATLON_HEMI.search(q)
+    if match:
+        lat = float(match.group(1)) * (-1 if match.group(2) == "s" else 1)
+        lon = float(match.group(3)) * (-1 if match.group(4) == "w" else 1)
+    else:
+        match = _LATLON_NAMED.search(q)
+        if not match:
+            return None, None
+        lat, lon = float(match.group(1)), float(match.group(2))
+    if not -90 <= lat <= 90:
+        return None, None
+    lon = (lon + 180) % 360 - 180
+    radius_km = DEFAULT_RADIUS_KM
+    radius = _RADIUS.search(q)
+    if radius:
+        radius_km = float(radius.group(1)) * (1.852 if radius.group(2).startswith("n") else 1.0)
+    dlat = radius_km / 111.32
+    dlon = min(radius_km / (111.32 * max(0.01, math.cos(math.radians(lat)))), 180.0)
+    lon_min = (lon - dlon + 180) % 360 - 180
+    lon_max = (lon + dlon + 180) % 360 - 180
+    if dlon >= 180:
+        lon_min, lon_max = -180.0, 180.0
+    return f"{lat:g},{lon:g}", (max(lat - dlat, -90.0), min(lat + dlat, 90.0), lon_min, lon_max)
+
+
+def extract_entities(question, today=None):
+    """Entities mentioned in `question`, e.g.
+
+    {"float_id": "4903775", "time_from": date(2023, 3, 1), "time_to": date(2023, 4, 1),
+     "pressure_min": 500.0}
+
+    time_to is exclusive. Keys are only present for what the question mentions.
+    """
+    q = question.lower()
+    today = today or date.today()
+    entities = {}
+
+    match = _FLOAT_ID.search(q) or _BARE_FLOAT_ID.search(q)
+    if match:
+        entities["float_id"] = match.group(1)
+        # Keep the id from being read as a year or a depth below
+        q = q[:match.start(1)] + " " * len(match.group(1)) + q[match.end(1):]
+
+    try:
+        time_from, time_to = _dates(q, today)
+    except ValueError:
+        # Not a real date (2023-02-30); answer without a time filter
+        time_from = time_to = None
+    if time_from:
+        entities["time_from"] = time_from
+    if time_to:
+        entities["time_to"] = time_to
+
+    match = _DEPTH_RANGE.search(q)
+    if match:
+        low, high = sorted((float(match.group(1)), float(match.group(2))))
+        entities["pressure_min"], entities["pressure_max"] = low, high
+    else:
+        match = _DEEPER.search(q)
+        if match:
+            entities["pressure_min"] = float(match.group(1))
+        match = _SHALLOWER.search(q)
+        if match:
+            entities["pressure_max"] = float(match.group(1))
+
+    region, box = _region(q)
+    if region:
+        entities["region"] = region
+        entities["lat_min"], entities["lat_max"], entities["lon_min"], entities["lon_max"] = box
+
+    match = _LIMIT.search(q) or _ROWS.search(q)
+    if match and int(match.group(1)) > 0:
+        entities["limit"] = min(int(match.group(1)), MAX_LIMIT)
+    return entities
+
+
+def entity_shape(entities):
+    """What the SQL of a plan depends on besides the intent: which entities are present."""
+    # The row count is a bound parameter, so it does not change the SQL
+    shape = sorted(name for name in entities if name != "limit")
+    if "region" in entities and entities["lon_min"] > entities["lon_max"]:
+        shape.append("antimeridian")
+    return ",".join(shape)
+
+
+def filter_conditions(entities, use_float_summary=True):
+    """(conditions, params) restricting argo_profiles rows to the entities.
+
+    Without `use_float_summary` (a database without float_summary or
+    PostGIS) a region is only checked against the rows' lat/lon.
+    """
+    conditions, params = [], {}
+    if "float_id" in entities:
+        conditions.append("float_id = %(float_id)s")
+        params["float_id"] = entities["float_id"]
+    if "time_from" in entities:
+        conditions.append("time >= %(time_from)s")
+        params["time_from"] = entities["time_from"]
+    if "time_to" in entities:
+        conditions.append("time < %(time_to)s")
+        params["time_to"] = entities["time_to"]
+    if "pressure_min" in entities:
+        conditions.append("pressure >= %(pressure_min)s")
+        params["pressure_min"] = entities["pressure_min"]
+    if "pressure_max" in entities:
+        conditions.append("pressure <= %(pressure_max)s")
+        params["pressure_max"] = entities["pressure_max"]
+    if "region" in entities:
+        for name in ("lat_min", "lat_max", "lon_min", "lon_max"):
+            params[name] = entities[name]
+        crosses = entities["lon_min"] > entities["lon_max"]
+        if crosses:
+            envelope = ("(ST_Intersects(track, ST_MakeEnvelope(%(lon_min)s, %(lat_min)s, 180, %(lat_max)s, 4326))"
+                        " OR ST_Intersects(track, ST_MakeEnvelope(-180, %(lat_min)s, %(lon_max)s, %(lat_max)s, 4326)))")
+            lon = "(lon >= %(lon_min)s OR lon <= %(lon_max)s)"
+        else:
+            envelope = "ST_Intersects(track, ST_MakeEnvelope(%(lon_min)s, %(lat_min)s, %(lon_max)s, %(lat_max)s, 4326))"
+            lon = "lon BETWEEN %(lon_min)s AND %(lon_max)s"
+        if use_float_summary and "float_id" not in entities:
+            conditions.append(f"float_id IN (SELECT float_id FROM float_summary WHERE {envelope})")
+        conditions.append("lat BETWEEN %(lat_min)s AND %(lat_max)s")
+        conditions.append(lon)
+    return conditions, params
+
+
+def describe_filters(entities):
+    """Short human-readable summary, e.g. 'float 4903775, 2023-03-01 to 2023-03-31, pressure >= 500 dbar'."""
+    parts = []
+    if "float_id" in entities:
+        parts.append(f"float {entities['float_id']}")
+    if "time_from" in entities or "time_to" in entities:
+        start = entities.get("time_from")
+        end = entities.get("time_to")
+        last = end - timedelta(days=1) if end else None
+        if start and last:
+            parts.append(str(start) if start == last else f"{start} to {last}")
+        elif start:
+            parts.append(f"since {start}")
+        else:
+            parts.append(f"up to {last}")
+    if "pressure_min" in entities and "pressure_max" in entities:
+        parts.append(f"pressure {entities['pressure_min']:g}-{entities['pressure_max']:g} dbar")
+    elif "pressure_min" in entities:
+        parts.append(f"pressure >= {entities['pressure_min']:g} dbar")
+    elif "pressure_max" in entities:
+        parts.append(f"pressure <= {entities['pressure_max']:g} dbar")
+    if "region" in entities:
+        region = entities["region"]
+        parts.append(region.title() if region in BASINS else f"near {region}")
+    return ", ".join(parts)
@@ -0,0 +1,347 @@
+"""
+Keyword intent engine shared by every question-to-SQL path
+(nlp/smart_query.py, api/simple_nlp.py and /ask in api/main.py).
+
+An intent names a SQL template and the keywords a question needs: a list of
+groups, each satisfied by any one of its keywords, like the old
+`"float" in q and ("position" in q or "location" in q)` branches. Keywords
+match at the start of a word, so "float" also matches "floats" but "count"
+no longer matches "account".
+
+Everything is compiled once, when an intent is registered: all keywords go
+into one alternation regex (longest first), so a single scan of the question
+finds every keyword in it, and each keyword gets a bit, so each group is a
+bitmask and an intent matches when all of its masks share a bit with the
+question's. The intent chosen for each combination of keywords is
+remembered, so matching is one regex pass and a dict lookup.
+
+The first matching intent in registry order wins, which keeps the priority
+of the old if/elif chains. Adding a question type is a register() call.
+
+Float ids, dates, depth bounds, regions and row counts in the question are
+extracted by entities.py and bound as parameters into the intent's
+template, so "temperature of float 4903775 in March 2023 below 500 dbar"
+becomes an index-backed lookup instead of the latest ten rows.
+
+Usage:
+  from intents import intent_engine
+  plan = intent_engine.plan("Temperature of float 4903775 in March 2023")
+  plan.intent.name, plan.sql, plan.params, plan.describe(rows)
+"""
+
+import hashlib
+import re
+
+from entities import describe_filters, entity_shape, extract_entities, filter_conditions
+from plan_cache import PlanCache
+
+# Rows returned when the question does not say how many
+DEFAULT_LIMIT = 10
+# Bound on remembered keyword combinations (2**keywords are possible)
+MAX_DECISIONS = 65536
+
+
+class Intent:
+    """A SQL template, the keyword groups that select it, and how to phrase its answer.
+
+    `sql` has a {where} slot for the intent's own conditions plus those of
+    the entities in the question, and may end in LIMIT %(limit)s.
+    """
+
+    def __init__(self, name, sql, keywords=(), describe=None, where=(), limit=DEFAULT_LIMIT):
+        self.name = name
+        self.sql = sql
+        self.keywords = [tuple(k.lower() for k in group) for group in keywords]
+        self.where = list(where)
+        self.limit = limit
+        self._describe = describe
+
+    def render(self, entities=None, use_float_summary=True):
+        """(sql, params) for this intent filtered by `entities` (see entities.extract_entities)."""
+        entity_conditions, params = filter_conditions(entities or {}, use_float_summary)
+        conditions = self.where + entity_conditions
+        sql = " ".join(self.sql.format(where="WHERE " + " AND ".join(conditions) if conditions else "").split())
+        return sql, self._with_limit(params, entities)
+
+    def bind(self, entities, names):
+        """Just the params of render(), for a plan whose SQL (and so its parameter `names`) is already known."""
+        return self._with_limit({name: entities[name] for name in names}, entities)
+
+    def _with_limit(self, params, entities):
+        params["limit"] = (entities or {}).get("limit", self.limit)
+        return params
+
+    def signature(self):
+        return repr((self.name, self.sql, self.keywords, self.where, self.limit))
+
+    def describe(self, data):
+        """One-sentence natural language answer for the rows the SQL returned."""
+        if not data:
+            return "I couldn't find any data matching your question."
+        if self._describe is None:
+            return (f"I found {len(data)} records matching your question. The data includes various "
+                    "oceanographic measurements from ARGO floats.")
+        return self._describe(data)
+
+    def __repr__(self):
+        return f"Intent({self.name!r})"
+
+
+class Plan:
+    """The intent chosen for a question, its entities, and the SQL and params to run."""
+
+    def __init__(self, intent, entities, sql=None, param_names=None):
+        self.intent = intent
+        self.entities = entities
+        self.cached = sql is not None
+        if self.cached:
+            self.sql, self.params = sql, intent.bind(entities, param_names)
+        else:
+            self.sql, self.params = intent.render(entities)
+
+    @property
+    def param_names(self):
+        """Entity parameters of the SQL (the row limit is bound separately)."""
+        return [name for name in self.params if name != "limit"]
+
+    def describe(self, data):
+        answer = self.intent.describe(data)
+        filters = describe_filters(self.entities)
+        return f"{answer} (Filtered to {filters}.)" if filters else answer
+
+
+class IntentEngine:
+    """Registry of intents compiled into one keyword regex and per-intent bitmasks."""
+
+    def __init__(self, intents=(), default=None, plan_cache=None):
+        self._intents = list(intents)
+        self.default = default
+        self.plan_cache = plan_cache
+        self._compile()
+
+    def register(self, intent, before=None):
+        """Add an intent (ahead of the intent named `before` when given) and recompile."""
+        position = len(self._intents)
+        if before is not None:
+            position = [i.name for i in self._intents].index(before)
+        self._intents.insert(position, intent)
+        self._compile()
+
+    def _compile(self):
+        keywords = sorted({k for intent in self._intents for group in intent.keywords for k in group},
+                          key=lambda k: (-len(k), k))
+        self._bits = {keyword: 1 << i for i, keyword in enumerate(keywords)}
+        self._pattern = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + ")") if keywords else None
+        self._masks = []
+        for intent in self._intents:
+            masks = []
+            for group in intent.keywords:
+                mask = 0
+                for keyword in group:
+                    mask |= self._bits[keyword]
+                masks.append(mask)
+            self._masks.append((intent, masks))
+        # keyword mask -> intent (None: no match); few distinct masks occur in practice
+        self._decisions = {}
+        self._by_name = {i.name: i for i in self._intents + ([self.default] if self.default else [])}
+        self.use_plan_cache(self.plan_cache)
+
+    def fingerprint(self):
+        """Digest of every template and keyword, so cached plans of an older registry are dropped."""
+        intents = self._intents + ([self.default] if self.default else [])
+        return hashlib.sha256("\n".join(i.signature() for i in intents).encode()).hexdigest()[:16]
+
+    @property
+    def intents(self):
+        return list(self._intents)
+
+    def get(self, name):
+        return self._by_name[name]
+
+    def use_plan_cache(self, plan_cache):
+        """Attach a PlanCache (None to plan every question from scratch)."""
+        self.plan_cache = plan_cache
+        if plan_cache is not None:
+            plan_cache.bind(self.fingerprint())
+
+    def keyword_mask(self, question):
+        """Bitmask of the registered keywords found in `question`."""
+        if self._pattern is None:
+            return 0
+        bits = self._bits
+        mask = 0
+        for keyword in self._pattern.findall(question.lower()):
+            mask |= bits[keyword]
+        return mask
+
+    def match(self, question, default=None):
+        """First intent whose keyword groups are all present in `question`, else the default."""
+        return self._match_mask(self.keyword_mask(question), default)
+
+    def _match_mask(self, found, default=None):
+        try:
+            intent = self._decisions[found]
+        except KeyError:
+            intent = self._decide(found)
+            if len(self._decisions) < MAX_DECISIONS:
+                self._decisions[found] = intent
+        return intent or default or self.default
+
+    def plan(self, question, default=None, today=None):
+        """Plan for `question`: matched intent plus the entities it mentions, bound as params.
+
+        With a plan cache, a question whose keywords and entity shape were
+        planned before reuses that intent, SQL and parameter names; only the
+        entity values are extracted anew and looked up by name.
+        """
+        entities = extract_entities(question, today)
+        if self.plan_cache is None:
+            return Plan(self.match(question, default), entities)
+        found = self.keyword_mask(question)
+        key = self.plan_key(found, entities, default)
+        cached = self.plan_cache.get(key)
+        if cached is not None:
+            try:
+                return Plan(self.get(cached["intent"]), entities, cached["sql"], cached["params"])
+            except KeyError:
+                pass
+        plan = Plan(self._match_mask(found, default), entities)
+        self.plan_cache.put(key, {"intent": plan.intent.name, "sql": plan.sql, "params": plan.param_names})
+        return plan
+
+    @staticmethod
+    def plan_key(found, entities, default=None):
+        """Cache key: the question's keyword mask, entity shape and the caller's default.
+
+        These decide the plan completely (the intent follows from the keywords,
+        its SQL from which entities are present), and cost a fraction of
+        planning, unlike a placeholder form of the whole question text.
+        """
+        return f"{found:x}|{entity_shape(entities)}|{default.name if default else ''}"
+
+    def _decide(self, found):
+        if found:
+            for intent, masks in self._masks:
+                if all(found & mask for mask in masks):
+                    return intent
+        return None
+
+
+# ------------------------------------------------------------
+# Registry (order is priority)
+# ------------------------------------------------------------
+def _single_or_series(noun, detail, single):
+    def describe(data):
+        if len(data) > 1:
+            return f"I found {len(data)} {noun}. {detail}"
+        return single(data[0])
+    return describe
+
+
+COLD_WATER_SQL = "SELECT * FROM argo_profiles {where} ORDER BY temperature ASC LIMIT %(limit)s"
+
+
+def _cold_water(data):
+    return f"I found {len(data)} cold water measurements (below 5°C), coldest first."
+
+
+INTENTS = [
+    Intent(
+        "average_temperature",
+        "SELECT AVG(temperature) as average_temperature FROM argo_profiles {where}",
+        [("average", "mean"), ("temperature",)],
+        lambda data: (f"The average ocean temperature from ARGO float data is {data[0]['average_temperature']:.2f}°C."
+                      if data[0].get("average_temperature") is not None
+                      else "I couldn't find any temperature readings matching your question."),
+        where=["temperature IS NOT NULL"],
+    ),
+    Intent(
+        "temperature_over_time",
+        "SELECT DATE(time) as date, AVG(temperature) as avg_temp FROM argo_profiles {where} "
+        "GROUP BY DATE(time) ORDER BY date DESC LIMIT %(limit)s",
+        [("temperature",), ("time", "over", "trend")],
+        lambda data: f"Here are the daily average temperatures for the {len(data)} most recent days with data.",
+        where=["temperature IS NOT NULL"],
+    ),
+    Intent("cold_water", COLD_WATER_SQL, [("cold",)], _cold_water, where=["temperature < 5"], limit=5),
+    Intent("low_temperature", COLD_WATER_SQL, [("temperature",), ("low",)], _cold_water,
+           where=["temperature < 5"], limit=5),
+    Intent(
+        "temperature_data",
+        "SELECT time, float_id, pressure, temperature, lat, lon FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s",
+        [("temperature",)],
+        _single_or_series(
+            "temperature readings",
+            "The most recent measurements show temperatures ranging across different ocean depths and locations.",
+            lambda row: f"The temperature reading is {row.get('temperature')}°C recorded at {row.get('time', 'unknown time')}.",
+        ),
+        where=["temperature IS NOT NULL"],
+    ),
+    Intent(
+        "high_salinity",
+        "SELECT * FROM argo_profiles {where} ORDER BY salinity DESC LIMIT %(limit)s",
+        [("salinity", "salty"), ("high", "salty")],
+        lambda data: f"I found {len(data)} high salinity measurements (above 35 PSU), saltiest first.",
+        where=["salinity > 35"], limit=5,
+    ),
+    Intent(
+        "salinity_data",
+        "SELECT time, float_id, pressure, salinity, lat, lon FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s",
+        [("salinity",)],
+        _single_or_series(
+            "salinity measurements",
+            "They show the salt content distribution across different ocean areas.",
+            lambda row: f"The salinity measurement is {row.get('salinity')} PSU (Practical Salinity Units).",
+        ),
+        where=["salinity IS NOT NULL"],
+    ),
+    Intent(
+        "pressure_data",
+        "SELECT time, float_id, pressure, lat, lon FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s",
+        [("pressure",)],
+        _single_or_series(
+            "pressure readings",
+            "They indicate depth measurements at various ocean locations.",
+            lambda row: f"The pressure reading is {row.get('pressure')} dbar, indicating ocean depth.",
+        ),
+        where=["pressure IS NOT NULL"],
+    ),
+    Intent(
+        "float_positions",
+        "SELECT float_id, AVG(lat) as avg_lat, AVG(lon) as avg_lon FROM argo_profiles {where} GROUP BY float_id LIMIT %(limit)s",
+        [("float",), ("position", "location", "where")],
+        lambda data: (f"I found {len(data)} ARGO float positions, each the average location of the float's profiles."
+                      if len(data) > 1 else "I found one float position in the data."),
+    ),
+    Intent(
+        "deep_ocean_data",
+        "SELECT * FROM argo_profiles {where} ORDER BY pressure DESC LIMIT %(limit)s",
+        [("deep", "depth")],
+        lambda data: f"I found {len(data)} deep ocean measurements (pressure > 100 dbar), representing data from deeper water levels.",
+        where=["pressure > 100"],
+    ),
+    Intent(
+        "surface_data",
+        "SELECT * FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s",
+        [("surface",)],
+        lambda data: f"I found {len(data)} surface-level measurements (pressure < 10 dbar), representing near-surface ocean conditions.",
+        where=["pressure < 10"],
+    ),
+    Intent(
+        "float_count",
+        "SELECT COUNT(DISTINCT float_id) as total_floats FROM argo_profiles {where}",
+        [("how many", "count", "total", "number of")],
+        lambda data: f"There are {data[0].get('total_floats', 0)} ARGO floats in the database.",
+    ),
+    Intent(
+        "recent_data",
+        "SELECT * FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s",
+        [("recent", "latest", "newest")],
+        lambda data: f"Here are the {len(data)} most recent observations from the ARGO float database, showing the latest oceanographic measurements.",
+    ),
+]
+
+# Questions no intent recognises get the latest few rows
+FALLBACK = Intent("fallback", "SELECT * FROM argo_profiles {where} ORDER BY time DESC LIMIT %(limit)s", limit=5)
+
+intent_engine = IntentEngine(INTENTS, default=FALLBACK, plan_cache=PlanCache())
@@ -0,0 +1,137 @@
+"""
+Plan cache for question -> SQL translation.
+
+Questions are keyed by their normalized form as the intent engine sees it
+(IntentEngine.plan_key): the bitmask of the keywords found, which fixes the
+intent, plus the shape of the entities found, which fixes the SQL. So
+"Temperature of float 4903775 in March 2023?" and "temperature of float
+2902206 in jan 2021" share one entry. The entry is the prepared plan: the
+intent name, its SQL with %(name)s parameters and the parameter names. On
+a hit the translation step is skipped and the entity values of the new
+question are bound by name.
+
+Entries are kept in an LRU and written to a JSON file (PLAN_CACHE_PATH) so
+the cache survives restarts; the file records a fingerprint of the intent
+registry and the entry format, and is ignored once either changes.
+
+Env:
+  PLAN_CACHE_PATH         (default: nlp/plan_cache.json; empty disables persistence)
+  PLAN_CACHE_MAX_ENTRIES  (default: 4096)
+  PLAN_CACHE_SAVE_EVERY   (new entries between writes, default: 50)
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger("nlp.plan_cache")
+
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "plan_cache.json"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "4096"))
+PLAN_CACHE_SAVE_EVERY = int(os.getenv("PLAN_CACHE_SAVE_EVERY", "50"))
+# Bumped when keys or entries change shape, so older files are not loaded
+PLAN_CACHE_FORMAT = 2
+
+
+class PlanCache:
+    """Thread-safe LRU of prepared plans with hit metrics and a JSON file behind it."""
+
+    def __init__(self, path=PLAN_CACHE_PATH, max_entries=PLAN_CACHE_MAX_ENTRIES, save_every=PLAN_CACHE_SAVE_EVERY):
+        self.path = path or None
+        self.max_entries = max_entries
+        self.save_every = save_every
+        self.fingerprint = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # One writer at a time: the temp file is per process, not per thread
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loaded = 0
+
+    def bind(self, fingerprint):
+        """Attach to an intent registry; entries (and the file) of another registry are dropped."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            self._entries.clear()
+        self.load()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._unsaved += 1
+            due = self.path and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable plan cache %s: %s", self.path, e)
+            return
+        if stored.get("fingerprint") != self.fingerprint or stored.get("format") != PLAN_CACHE_FORMAT:
+            log.info("Plan cache %s was built for other templates or an older format; starting empty.", self.path)
+            return
+        with self._lock:
+            for key, entry in stored.get("entries", [])[-self.max_entries:]:
+                self._entries[key] = entry
+            self.loaded = len(self._entries)
+        log.info("Loaded %d cached plans from %s.", self.loaded, self.path)
+
+    def save(self):
+        """Write the entries (oldest first, so a reload keeps the LRU order) atomically."""
+        if not self.path:
+            return
+        with self._save_lock:
+            # Snapshot under the save lock too, so a newer snapshot is never replaced by an older one
+            with self._lock:
+                snapshot = {"fingerprint": self.fingerprint, "format": PLAN_CACHE_FORMAT, "entries": list(self._entries.items())}
+                self._unsaved = 0
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                log.warning("Could not save the plan cache to %s: %s", self.path, e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "loaded_from_disk": self.loaded,
+            "path": self.path,
+        }
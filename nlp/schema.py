@@ -16,6 +16,27 @@ Tables:
    - avg_lat: float
    - avg_lon: float
 
+3. observation_levels (only in the wide storage layout; observations is then a view over it)
+   - float_id: varchar
+   - cycle: int
+   - obs_time: timestamp
+   - lat: float
+   - lon: float
+   - depth: float
+   - temperature: float
+   - salinity: float
+   One row per float, cycle and depth. Use it instead of joining observations
+   to itself when a question needs temperature and salinity at the same level.
+
+4. float_summary (one row per float, kept up to date by the loader)
+   - float_id: varchar
+   - first_observation, last_observation: timestamp
+   - total_observations: bigint, total_profiles: int
+   - avg_lat, avg_lon: float (centroid)
+   - lat_min, lat_max, lon_min, lon_max: float (bounding box)
+   - last_cycle: int, last_lat, last_lon: float (last known position)
+   Prefer it over aggregating observations for per-float questions.
+
 Variables:
 - TEMP: Temperature (°C)
 - PSAL: Salinity (PSU) 
@@ -316,7 +316,7 @@ export default function App() {
                   <Typography variant="h6">Loading float data...</Typography>
                 </Box>
               ) : (
-                <FloatMap floats={floatData} />
+                <FloatMap />
               )}
             </Box>
           </Paper>
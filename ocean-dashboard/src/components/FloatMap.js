@@ -1,5 +1,12 @@
-import React from "react";
-import { MapContainer, TileLayer, Marker, Popup } from "react-leaflet";
+import React, { useCallback, useEffect, useState } from "react";
+import {
+  MapContainer,
+  TileLayer,
+  Marker,
+  CircleMarker,
+  Popup,
+  useMapEvents,
+} from "react-leaflet";
 import "leaflet/dist/leaflet.css";
 import L from "leaflet";
 
@@ -12,7 +19,76 @@ L.Icon.Default.mergeOptions({
   shadowUrl: "https://unpkg.com/leaflet@1.7.1/dist/images/marker-shadow.png",
 });
 
-export default function FloatMap({ floats }) {
+// /map/grid cells are 360 / 2**zoom degrees; three levels above the map zoom
+// makes them about 32px wide, so the number of markers depends on the screen
+// and not on the size of the fleet.
+const GRID_ZOOM_OFFSET = 3;
+const MAX_GRID_ZOOM = 16;
+
+function gridUrl(map) {
+  const bounds = map.getBounds();
+  const zoom = Math.min(Math.max(map.getZoom() + GRID_ZOOM_OFFSET, 0), MAX_GRID_ZOOM);
+  const params = new URLSearchParams({
+    zoom,
+    lat_min: Math.max(bounds.getSouth(), -90),
+    lat_max: Math.min(bounds.getNorth(), 90),
+  });
+  // Leave longitude open once the view spans the whole world
+  if (bounds.getEast() - bounds.getWest() < 360) {
+    params.set("lon_min", bounds.getWest());
+    params.set("lon_max", bounds.getEast());
+  }
+  return `http://localhost:8000/map/grid?${params}`;
+}
+
+function FloatClusters() {
+  const [cells, setCells] = useState([]);
+
+  const load = useCallback((map) => {
+    fetch(gridUrl(map))
+      .then((res) => res.json())
+      .then((json) => setCells(json.cells || []))
+      .catch(() => setCells([]));
+  }, []);
+
+  const map = useMapEvents({
+    moveend: () => load(map),
+  });
+
+  useEffect(() => {
+    load(map);
+  }, [load, map]);
+
+  return cells.map((cell) =>
+    cell.count === 1 ? (
+      <Marker key={`${cell.cell_x}-${cell.cell_y}`} position={[cell.lat, cell.lon]}>
+        <Popup>
+          Float ID: {cell.float_id}
+          <br />
+          Location: [{cell.lat.toFixed(2)}, {cell.lon.toFixed(2)}]
+        </Popup>
+      </Marker>
+    ) : (
+      <CircleMarker
+        key={`${cell.cell_x}-${cell.cell_y}`}
+        center={[cell.lat, cell.lon]}
+        radius={8 + 4 * Math.log10(cell.count)}
+        pathOptions={{ color: "#176CA0", fillOpacity: 0.6 }}
+        eventHandlers={{
+          click: () => map.setView([cell.lat, cell.lon], map.getZoom() + 2),
+        }}
+      >
+        <Popup>
+          {cell.count} floats
+          <br />
+          Around [{cell.lat.toFixed(2)}, {cell.lon.toFixed(2)}]
+        </Popup>
+      </CircleMarker>
+    )
+  );
+}
+
+export default function FloatMap() {
   const defaultPosition = [0, 0]; // Equator center for map start view
 
   return (
@@ -22,20 +98,7 @@ export default function FloatMap({ floats }) {
       style={{ height: "400px", width: "100%", borderRadius: "8px" }}
     >
       <TileLayer url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png" />
-      {floats.map((float) =>
-        float.avg_lat && float.avg_lon ? (
-          <Marker
-            key={float.id || float.float_id}
-            position={[float.avg_lat, float.avg_lon]}
-          >
-            <Popup>
-              Float ID: {float.id || float.float_id}
-              <br />
-              Location: [{float.avg_lat.toFixed(2)}, {float.avg_lon.toFixed(2)}]
-            </Popup>
-          </Marker>
-        ) : null
-      )}
+      <FloatClusters />
     </MapContainer>
   );
 }
@@ -0,0 +1,166 @@
+"""
+KV cache of the constant system prompt for the chatbot model (used by
+ai_chatbot_server.py).
+
+Every prompt starts with the same "System: ..." line. Its keys and values
+are computed once at startup; each generation gets a copy (repeated once
+per row for a batch) and generate() then prefills only the
+"User: ...\\nBot:" part. Batched prompts are laid out as prefix, padding,
+question (rather than padding first), so every row shares the cached
+prefix at the same positions; the attention mask hides the padding and
+position ids still count only real tokens.
+
+Reuse is disabled, with the reason in stats(), when the tokenizer would
+merge tokens across the prefix/question boundary (the cached prefix would
+then not be the prefix of the real prompt) or the model is not a PyTorch
+module (the onnx backend manages its own cache).
+
+The prefill time saved is measured at startup, for a single prompt and for
+a padded batch, as the difference between prefilling whole sample prompts
+and copying the cache plus prefilling only their question part; a forward
+pass over the prefix alone would overstate it, as the prefix tokens are
+cheap once a forward pass is running anyway. stats() scales those by the
+rows generated since.
+
+A cached prefix costs generate() an explicit attention mask on its first
+step (query and key lengths differ, so the plain causal kernel no longer
+applies). Padded batches build that mask anyway, but for a single prompt
+on a small model it can outweigh the prefill saved; use_for() only reuses
+the cache where the startup measurement came out ahead.
+"""
+
+import copy
+import statistics
+import threading
+import time
+
+import torch
+
+SAMPLE_TURNS = (
+    "\nUser: What is the salinity?\nBot:",
+    "\nUser: How deep do the floats go in the Arabian Sea?\nBot:",
+    "\nUser: What is the ocean temperature?\nBot:",
+    "\nUser: Which float measured the coldest water last month?\nBot:",
+)
+
+
+def median_seconds(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+class PrefixCache:
+    """The system prompt's KV state, copied into each generate call."""
+
+    def __init__(self, model, tokenizer, prefix, sample_turns=SAMPLE_TURNS, timing_runs=5):
+        self.tokenizer = tokenizer
+        self.prefix = prefix
+        self.cache = None
+        self.length = 0
+        self.saved_single = 0.0
+        self.saved_per_batched_row = 0.0
+        self.disabled_reason = None
+        self._lock = threading.Lock()
+        self.generations = 0
+        self.single_rows = 0
+        self.batched_rows = 0
+        self.copy_seconds = 0.0
+
+        if not isinstance(model, torch.nn.Module):
+            self.disabled_reason = "backend has no reusable PyTorch KV cache"
+            return
+        self.prefix_ids = tokenizer(prefix, return_tensors="pt")["input_ids"]
+        for turn in sample_turns:
+            whole = tokenizer(prefix + turn)["input_ids"]
+            split = self.prefix_ids[0].tolist() + tokenizer(turn, add_special_tokens=False)["input_ids"]
+            if whole != split:
+                self.disabled_reason = "tokenizer merges tokens across the end of the system prompt"
+                return
+
+        with torch.no_grad():
+            self.cache = model(self.prefix_ids, use_cache=True).past_key_values
+            self.length = self.prefix_ids.shape[1]
+            self.saved_single = self._measure(model, sample_turns[:1], timing_runs)
+            self.saved_per_batched_row = self._measure(model, sample_turns, timing_runs) / len(sample_turns)
+
+    def _measure(self, model, turns, runs):
+        """Prefill time of the whole prompts minus that of copying the cache and prefilling the turns."""
+        # Masks passed as generate() passes them
+        whole = self.tokenizer([self.prefix + turn for turn in turns], return_tensors="pt", padding=True)
+        input_ids, attention_mask = self._layout(turns)
+        uncached = median_seconds(lambda: model(**whole, use_cache=True), runs)
+        cached = median_seconds(
+            lambda: model(
+                input_ids[:, self.length:],
+                attention_mask=attention_mask,
+                past_key_values=self._copy(len(turns)),
+                use_cache=True
+            ),
+            runs
+        )
+        return uncached - cached
+
+    @property
+    def enabled(self):
+        return self.cache is not None
+
+    def use_for(self, rows):
+        if not self.enabled:
+            return False
+        return (self.saved_single if rows == 1 else self.saved_per_batched_row) > 0
+
+    def _layout(self, turns, max_length=256):
+        encoded = self.tokenizer(
+            list(turns),
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=max_length - self.length,
+            add_special_tokens=False
+        )
+        rows = encoded["input_ids"].shape[0]
+        input_ids = torch.cat([self.prefix_ids.expand(rows, -1), encoded["input_ids"]], dim=1)
+        attention_mask = torch.cat([torch.ones(rows, self.length, dtype=encoded["attention_mask"].dtype), encoded["attention_mask"]], dim=1)
+        return input_ids, attention_mask
+
+    def _copy(self, rows):
+        past_key_values = copy.deepcopy(self.cache)
+        if rows > 1:
+            past_key_values.batch_repeat_interleave(rows)
+        return past_key_values
+
+    def prepare(self, turns, max_length=256):
+        """input_ids, attention_mask and a private past_key_values for the prefix followed by each turn."""
+        input_ids, attention_mask = self._layout(turns, max_length)
+        rows = input_ids.shape[0]
+        start = time.perf_counter()
+        past_key_values = self._copy(rows)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.generations += 1
+            if rows == 1:
+                self.single_rows += 1
+            else:
+                self.batched_rows += rows
+            self.copy_seconds += elapsed
+        return input_ids, attention_mask, past_key_values
+
+    def stats(self):
+        with self._lock:
+            saved = self.single_rows * self.saved_single + self.batched_rows * self.saved_per_batched_row
+            return {
+                "enabled": self.enabled,
+                "disabled_reason": self.disabled_reason,
+                "prefix_tokens": self.length,
+                "saved_ms_single": round(self.saved_single * 1000, 2),
+                "saved_ms_per_batched_row": round(self.saved_per_batched_row * 1000, 2),
+                "generations": self.generations,
+                "single_rows": self.single_rows,
+                "batched_rows": self.batched_rows,
+                "copy_ms": round(self.copy_seconds * 1000, 2),
+                "prefill_saved_seconds": round(saved, 3),
+            }
@@ -1,82 +1,398 @@
+import argparse
 import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import xarray as xr
 import pandas as pd
 import numpy as np
 
+import parquet_store
+from ingest_manifest import load_manifest, plan_changes, save_manifest
+
 # Define directories
 raw_data_dir = 'data/raw'
 processed_data_dir = 'data/processed'
-os.makedirs(processed_data_dir, exist_ok=True)
 
 GOOD_QC_FLAGS = ['1', '2']  # ARGO quality flags for good data
 
+OUTPUT_COLUMNS = ['float_id', 'cycle', 'time', 'lat', 'lon', 'pressure',
+                  'temperature', 'temp_qc', 'salinity', 'salinity_qc']
+
+
+def _per_profile(values, n_prof, fill):
+    """Return a length-n_prof 1-D array, padding short coordinate arrays with `fill`."""
+    values = np.asarray(values)
+    if len(values) >= n_prof:
+        return values[:n_prof]
+    if values.dtype.kind == 'M':
+        dtype = values.dtype
+    elif values.dtype.kind in 'iuf':
+        dtype = float
+    else:
+        dtype = object
+    padded = np.full(n_prof, fill, dtype=dtype)
+    padded[:len(values)] = values
+    return padded
+
+
+def _qc_flags(ds, var, shape):
+    """QC flags as a str array of `shape`; files without a QC variable count as '2'."""
+    if var + '_QC' in ds.data_vars:
+        return ds[var + '_QC'].values.astype(str)
+    return np.full(shape, '2')
+
+
 def process_argo_file(nc_file):
-    ds = xr.open_dataset(nc_file)
-
-    # Choose adjusted variables if they exist, otherwise raw
-    temp_var = 'TEMP_ADJUSTED' if 'TEMP_ADJUSTED' in ds.data_vars else 'TEMP'
-    psal_var = 'PSAL_ADJUSTED' if 'PSAL_ADJUSTED' in ds.data_vars else 'PSAL'
-    pres_var = 'PRES_ADJUSTED' if 'PRES_ADJUSTED' in ds.data_vars else 'PRES'
-
-    n_prof = ds.dims['N_PROF']
-    n_levels = ds.dims['N_LEVELS']
-
-    temp = ds[temp_var].values
-    temp_qc = ds[temp_var + '_QC'].values.astype(str) if temp_var + '_QC' in ds.data_vars else np.array([['2']*n_levels]*n_prof)
-
-    salinity = ds[psal_var].values
-    salinity_qc = ds[psal_var + '_QC'].values.astype(str) if psal_var + '_QC' in ds.data_vars else np.array([['2']*n_levels]*n_prof)
-
-    pressure = ds[pres_var].values
-
-    lat = ds['LATITUDE'].values
-    lon = ds['LONGITUDE'].values
-    time = pd.to_datetime(ds['JULD'].values)
-
-    cycle = ds['CYCLE_NUMBER'].values if 'CYCLE_NUMBER' in ds else [np.nan]*n_prof
-    float_id = str(ds['PLATFORM_NUMBER'].values[0]) if 'PLATFORM_NUMBER' in ds else os.path.basename(nc_file)
-
-    records = []
-    for prof_idx in range(n_prof):
-        for level_idx in range(n_levels):
-            if (temp_qc[prof_idx, level_idx] in GOOD_QC_FLAGS and
-                salinity_qc[prof_idx, level_idx] in GOOD_QC_FLAGS):
-                records.append({
-                    'float_id': float_id,
-                    'cycle': cycle[prof_idx] if len(cycle) > prof_idx else np.nan,
-                    'time': time[prof_idx] if len(time) > prof_idx else pd.NaT,
-                    'lat': lat[prof_idx] if len(lat) > prof_idx else np.nan,
-                    'lon': lon[prof_idx] if len(lon) > prof_idx else np.nan,
-                    'pressure': pressure[prof_idx, level_idx],
-                    'temperature': temp[prof_idx, level_idx],
-                    'temp_qc': temp_qc[prof_idx, level_idx],
-                    'salinity': salinity[prof_idx, level_idx],
-                    'salinity_qc': salinity_qc[prof_idx, level_idx],
-                })
-
-    df = pd.DataFrame.from_records(records)
-    return df
-
-all_profiles = []
-
-for filename in os.listdir(raw_data_dir):
-    if filename.endswith('_prof.nc') or filename.endswith('prof.nc'):
-        file_path = os.path.join(raw_data_dir, filename)
-        print(f'Processing {filename}...')
-        try:
-            df_profile = process_argo_file(file_path)
-            if df_profile is not None and not df_profile.empty:
-                all_profiles.append(df_profile)
-            else:
-                print(f"No valid data found in {filename}")
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
-
-if all_profiles:
-    combined_df = pd.concat(all_profiles, ignore_index=True)
-    output_csv = os.path.join(processed_data_dir, 'argo_profiles_cleaned.csv')
-    combined_df.to_csv(output_csv, index=False)
-    print(f'Processed {len(all_profiles)} profile files successfully.')
-    print(f'Saved combined data to {output_csv}')
-else:
-    print("No valid profile data processed.")
\ No newline at end of file
+    """Extract good-QC (profile, level) rows of one *_prof.nc file as a DataFrame.
+
+    QC masks are computed over the whole N_PROF x N_LEVELS grid at once and the
+    per-profile coordinates are broadcast onto that grid, so the cost is a few
+    array operations per file instead of a Python loop per level.
+    """
+    with xr.open_dataset(nc_file) as ds:
+        # Choose adjusted variables if they exist, otherwise raw
+        temp_var = 'TEMP_ADJUSTED' if 'TEMP_ADJUSTED' in ds.data_vars else 'TEMP'
+        psal_var = 'PSAL_ADJUSTED' if 'PSAL_ADJUSTED' in ds.data_vars else 'PSAL'
+        pres_var = 'PRES_ADJUSTED' if 'PRES_ADJUSTED' in ds.data_vars else 'PRES'
+
+        n_prof = ds.sizes['N_PROF']
+        n_levels = ds.sizes['N_LEVELS']
+        shape = (n_prof, n_levels)
+
+        temp = ds[temp_var].values
+        temp_qc = _qc_flags(ds, temp_var, shape)
+        salinity = ds[psal_var].values
+        salinity_qc = _qc_flags(ds, psal_var, shape)
+        pressure = ds[pres_var].values
+
+        lat = _per_profile(ds['LATITUDE'].values, n_prof, np.nan)
+        lon = _per_profile(ds['LONGITUDE'].values, n_prof, np.nan)
+        obs_time = _per_profile(pd.to_datetime(ds['JULD'].values).values, n_prof, np.datetime64('NaT'))
+        cycle = _per_profile(ds['CYCLE_NUMBER'].values, n_prof, np.nan) if 'CYCLE_NUMBER' in ds else np.full(n_prof, np.nan)
+        float_id = str(ds['PLATFORM_NUMBER'].values[0]) if 'PLATFORM_NUMBER' in ds else os.path.basename(nc_file)
+
+    good = np.isin(temp_qc, GOOD_QC_FLAGS) & np.isin(salinity_qc, GOOD_QC_FLAGS)
+    if not good.any():
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    # Row-major nonzero keeps the original (profile, level) output order
+    prof_idx, level_idx = np.nonzero(good)
+
+    return pd.DataFrame({
+        'float_id': np.full(len(prof_idx), float_id, dtype=object),
+        'cycle': cycle[prof_idx],
+        'time': obs_time[prof_idx],
+        'lat': lat[prof_idx],
+        'lon': lon[prof_idx],
+        'pressure': pressure[good],
+        'temperature': temp[good],
+        'temp_qc': temp_qc[good],
+        'salinity': salinity[good],
+        'salinity_qc': salinity_qc[good],
+    }, columns=OUTPUT_COLUMNS)
+
+
+def list_profile_files(input_dir):
+    """Profile files in `input_dir`, sorted so output order never depends on the filesystem."""
+    return sorted(
+        os.path.join(input_dir, filename)
+        for filename in os.listdir(input_dir)
+        if filename.endswith('_prof.nc') or filename.endswith('prof.nc')
+    )
+
+
+def _process_one(file_path):
+    """Pool worker: extract one file and report how long it took instead of raising."""
+    start = time.perf_counter()
+    try:
+        df = process_argo_file(file_path)
+        error = None
+    except Exception as e:
+        df, error = None, f'{type(e).__name__}: {e}'
+    return file_path, df, time.perf_counter() - start, error
+
+
+def _iter_results(files, workers):
+    """Yield (index, result) pairs as files finish, in completion order."""
+    if workers <= 1:
+        for index, file_path in enumerate(files):
+            yield index, _process_one(file_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_process_one, file_path): index for index, file_path in enumerate(files)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def source_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def part_path(parts_dir, file_path):
+    """Per-source-file output, so a changed NetCDF file only replaces its own rows."""
+    return os.path.join(parts_dir, source_name(file_path) + '.csv')
+
+
+def _write_part(df, path):
+    tmp = path + '.tmp'
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def _profile_key(profile):
+    float_id, cycle = profile
+    return float_id, -1 if cycle is None else cycle
+
+
+def _profiles(df):
+    """Sorted [float_id, cycle] pairs in `df`; cycle is None where the file has none."""
+    if df is None or df.empty:
+        return []
+    pairs = df[['float_id', 'cycle']].drop_duplicates()
+    return sorted(([str(f), None if pd.isna(c) else int(c)] for f, c in pairs.itertuples(index=False)),
+                  key=_profile_key)
+
+
+def _report(file_path, df, elapsed, error):
+    filename = os.path.basename(file_path)
+    rows = 0 if df is None else len(df)
+    if error:
+        print(f'Error processing {filename} ({elapsed:.2f}s): {error}')
+    elif rows == 0:
+        print(f'No valid data found in {filename} ({elapsed:.2f}s)')
+    else:
+        print(f'Processed {filename}: {rows} rows in {elapsed:.2f}s')
+    return {'path': file_path, 'file': filename, 'rows': rows, 'seconds': elapsed,
+            'error': error, 'part': None, 'profiles': _profiles(df)}
+
+
+def ingest(files, output, workers=1, parts_dir=None, fmt='csv'):
+    """Process `files` across `workers` processes and stream the rows into `output`.
+
+    For CSV, results are written in sorted file order as soon as every earlier
+    file has finished, so only out-of-order results are held in memory and the
+    output is byte-identical for any worker count. With `parts_dir`, each
+    file's rows are also written to its own part file as soon as it completes.
+    For Parquet, `output` and `parts_dir` are stores (see parquet_store) and
+    every file is written under its own source name, so completion order does
+    not matter. A CSV `output` left by an earlier run is removed when no file
+    yields rows. Returns a list of per-file reports.
+    """
+    if fmt == 'parquet':
+        return _ingest_parquet(files, output, workers, parts_dir)
+
+    reports = []
+    pending = {}
+    next_index = 0
+    rows_written = 0
+    tmp_csv = output + '.tmp'
+
+    with open(tmp_csv, 'w', newline='') as out:
+        for index, (file_path, df, elapsed, error) in _iter_results(files, workers):
+            report = _report(file_path, df, elapsed, error)
+            if report['rows'] and parts_dir:
+                report['part'] = part_path(parts_dir, file_path)
+                _write_part(df, report['part'])
+            reports.append(report)
+
+            pending[index] = df
+            while next_index in pending:
+                ready = pending.pop(next_index)
+                if ready is not None and not ready.empty:
+                    ready.to_csv(out, index=False, header=rows_written == 0)
+                    rows_written += len(ready)
+                next_index += 1
+
+    if rows_written:
+        os.replace(tmp_csv, output)
+    else:
+        os.remove(tmp_csv)
+        # No rows this time: a previous run's output must not pass for this one's
+        _remove_stale(output)
+    return sorted(reports, key=lambda r: r['file'])
+
+
+def _ingest_parquet(files, output_dir, workers, store_dir):
+    reports = []
+    for _, (file_path, df, elapsed, error) in _iter_results(files, workers):
+        report = _report(file_path, df, elapsed, error)
+        if report['rows']:
+            parquet_store.write_source(df, output_dir, source_name(file_path))
+            if store_dir:
+                parquet_store.write_source(df, store_dir, source_name(file_path))
+                report['part'] = source_name(file_path)
+        reports.append(report)
+    return sorted(reports, key=lambda r: r['file'])
+
+
+def combine_parts(parts, output_csv):
+    """Concatenate part CSVs into `output_csv` as raw text, keeping only the first header.
+
+    Nothing is parsed, so rebuilding the combined file after a small delta costs
+    a sequential copy rather than re-extracting the whole archive. With no
+    parts, any existing `output_csv` is removed.
+    """
+    tmp_csv = output_csv + '.tmp'
+    header_written = False
+    with open(tmp_csv, 'wb') as out:
+        for part in parts:
+            with open(part, 'rb') as f:
+                header = f.readline()
+                if not header_written:
+                    out.write(header)
+                    header_written = True
+                shutil.copyfileobj(f, out)
+    if header_written:
+        os.replace(tmp_csv, output_csv)
+    else:
+        os.remove(tmp_csv)
+        _remove_stale(output_csv)
+    return header_written
+
+
+def _remove_stale(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def print_summary(reports, wall_seconds):
+    failed = [r for r in reports if r['error']]
+    rows = sum(r['rows'] for r in reports)
+    cpu_seconds = sum(r['seconds'] for r in reports)
+    print(f'Files: {len(reports)}  ok: {len(reports) - len(failed)}  failed: {len(failed)}')
+    print(f'Rows: {rows}  wall: {wall_seconds:.2f}s  per-file total: {cpu_seconds:.2f}s')
+    if reports:
+        slowest = max(reports, key=lambda r: r['seconds'])
+        print(f"Slowest file: {slowest['file']} ({slowest['seconds']:.2f}s)")
+    for r in failed:
+        print(f"  FAILED {r['file']}: {r['error']}")
+
+
+def _remove_part(entry, fmt, store_dir):
+    part = entry.get('part')
+    if not part:
+        return
+    if fmt == 'parquet':
+        parquet_store.remove_source(store_dir, part)
+    elif os.path.exists(part):
+        os.remove(part)
+
+
+def write_retractions(path, profiles):
+    """Write the (float_id, cycle) profiles whose database rows the delta replaces.
+
+    The loader (RETRACT_FILE) deletes the rows of these profiles that the delta
+    does not contain: profiles of removed files, and levels or whole profiles
+    that a changed file no longer has. Always written, header only when empty,
+    so a previous run's list never passes for this one's.
+    """
+    df = pd.DataFrame(sorted(profiles, key=_profile_key), columns=['float_id', 'cycle'])
+    df['cycle'] = df['cycle'].astype('Int64')
+    _write_part(df, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract good-QC ARGO profile rows from NetCDF files.')
+    parser.add_argument('--input-dir', default=raw_data_dir)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help='csv: one combined CSV; parquet: a float/year/month partitioned store')
+    parser.add_argument('--output', help='Combined CSV, or the Parquet store directory')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('INGEST_WORKERS', os.cpu_count() or 1)),
+                        help='Number of worker processes (default: INGEST_WORKERS or CPU count)')
+    parser.add_argument('--manifest')
+    parser.add_argument('--parts-dir', help='Per-file CSV parts (csv format only)')
+    parser.add_argument('--delta-output', help='Rows from new/changed files only, for loading downstream')
+    parser.add_argument('--retract-output',
+                        help='CSV of (float_id, cycle) profiles whose database rows the delta replaces')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest and reprocess every file')
+    args = parser.parse_args()
+
+    if args.format == 'parquet':
+        args.output = args.output or os.path.join(processed_data_dir, 'argo_profiles_parquet')
+        args.delta_output = args.delta_output or os.path.join(processed_data_dir, 'argo_profiles_delta_parquet')
+        args.manifest = args.manifest or os.path.join(processed_data_dir, 'ingest_manifest_parquet.json')
+        # The store is the union of its per-file parts; there is no combine step
+        args.parts_dir = args.output
+    else:
+        args.output = args.output or os.path.join(processed_data_dir, 'argo_profiles_cleaned.csv')
+        args.delta_output = args.delta_output or os.path.join(processed_data_dir, 'argo_profiles_delta.csv')
+        args.manifest = args.manifest or os.path.join(processed_data_dir, 'ingest_manifest.json')
+        args.parts_dir = args.parts_dir or os.path.join(processed_data_dir, 'parts')
+    args.retract_output = args.retract_output or os.path.join(processed_data_dir, 'argo_profiles_delta_retract.csv')
+
+    for path in (args.output, args.delta_output, args.retract_output, args.manifest):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    os.makedirs(args.parts_dir, exist_ok=True)
+
+    files = list_profile_files(args.input_dir)
+    entries = {} if args.full else load_manifest(args.manifest)
+    changed, unchanged, removed, fingerprints = plan_changes(files, entries)
+    print(f'{len(files)} files: {len(changed)} new/changed, {len(unchanged)} unchanged, {len(removed)} removed')
+
+    # Profiles whose database rows may no longer all be in the output
+    retracted = set()
+    for path in removed:
+        entry = entries.pop(path)
+        retracted.update(map(tuple, entry.get('profiles', [])))
+        _remove_part(entry, args.format, args.parts_dir)
+
+    # Never leave a previous run's delta behind
+    if os.path.isdir(args.delta_output):
+        shutil.rmtree(args.delta_output)
+    elif os.path.exists(args.delta_output):
+        os.remove(args.delta_output)
+
+    reports = []
+    if changed:
+        print(f'Processing {len(changed)} files with {args.workers} worker(s)...')
+        start = time.perf_counter()
+        reports = ingest(changed, args.delta_output, workers=args.workers,
+                         parts_dir=args.parts_dir, fmt=args.format)
+        print_summary(reports, time.perf_counter() - start)
+
+    for r in reports:
+        if r['error']:
+            # Keep the old entry (if any): its fingerprint no longer matches, so
+            # the file is retried next run while its last good part stays in use.
+            continue
+        old = entries.get(r['path'], {})
+        if old.get('part') != r['part']:
+            _remove_part(old, args.format, args.parts_dir)
+        retracted.update(map(tuple, old.get('profiles', [])))
+        retracted.update(map(tuple, r['profiles']))
+        entries[r['path']] = dict(fingerprints[r['path']], rows=r['rows'], part=r['part'], profiles=r['profiles'])
+    for path in unchanged:
+        # Refresh mtime for files that were touched without changing content
+        entries[path].update(fingerprints[path])
+    save_manifest(args.manifest, entries)
+
+    # A profile that an unchanged (or failed) file still provides keeps its rows
+    reprocessed = {r['path'] for r in reports if not r['error']}
+    for path, entry in entries.items():
+        if path not in reprocessed:
+            retracted.difference_update(map(tuple, entry.get('profiles', [])))
+    write_retractions(args.retract_output, retracted)
+    if retracted:
+        print(f'{len(retracted)} profiles to replace in the database: {args.retract_output}')
+
+    if args.format == 'parquet':
+        print(f'Parquet store at {args.output} holds {sum(e["rows"] for e in entries.values())} rows')
+    elif changed or removed or not os.path.exists(args.output):
+        parts = [entries[path]['part'] for path in sorted(entries) if entries[path].get('part')]
+        if combine_parts(parts, args.output):
+            print(f'Saved combined data to {args.output}')
+        else:
+            print("No valid profile data processed.")
+    else:
+        print(f'Nothing changed; {args.output} is up to date.')
+
+    if any(r['error'] for r in reports):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
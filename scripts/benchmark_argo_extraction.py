@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+scripts/benchmark_argo_extraction.py
+
+Compares rows/sec of the old per-level loop against the vectorized
+process_argo_file on synthetic *_prof.nc files.
+
+Usage:
+  python scripts/benchmark_argo_extraction.py [--files 5] [--profiles 200] [--levels 500]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch_process_argo_profiles import GOOD_QC_FLAGS, process_argo_file  # noqa: E402
+
+
+def legacy_process_argo_file(nc_file):
+    """The original nested-loop extraction, kept here as the benchmark baseline."""
+    ds = xr.open_dataset(nc_file)
+
+    temp_var = 'TEMP_ADJUSTED' if 'TEMP_ADJUSTED' in ds.data_vars else 'TEMP'
+    psal_var = 'PSAL_ADJUSTED' if 'PSAL_ADJUSTED' in ds.data_vars else 'PSAL'
+    pres_var = 'PRES_ADJUSTED' if 'PRES_ADJUSTED' in ds.data_vars else 'PRES'
+
+    n_prof = ds.sizes['N_PROF']
+    n_levels = ds.sizes['N_LEVELS']
+
+    temp = ds[temp_var].values
+    temp_qc = ds[temp_var + '_QC'].values.astype(str) if temp_var + '_QC' in ds.data_vars else np.array([['2']*n_levels]*n_prof)
+
+    salinity = ds[psal_var].values
+    salinity_qc = ds[psal_var + '_QC'].values.astype(str) if psal_var + '_QC' in ds.data_vars else np.array([['2']*n_levels]*n_prof)
+
+    pressure = ds[pres_var].values
+
+    lat = ds['LATITUDE'].values
+    lon = ds['LONGITUDE'].values
+    time = pd.to_datetime(ds['JULD'].values)
+
+    cycle = ds['CYCLE_NUMBER'].values if 'CYCLE_NUMBER' in ds else [np.nan]*n_prof
+    float_id = str(ds['PLATFORM_NUMBER'].values[0]) if 'PLATFORM_NUMBER' in ds else os.path.basename(nc_file)
+
+    records = []
+    for prof_idx in range(n_prof):
+        for level_idx in range(n_levels):
+            if (temp_qc[prof_idx, level_idx] in GOOD_QC_FLAGS and
+                salinity_qc[prof_idx, level_idx] in GOOD_QC_FLAGS):
+                records.append({
+                    'float_id': float_id,
+                    'cycle': cycle[prof_idx] if len(cycle) > prof_idx else np.nan,
+                    'time': time[prof_idx] if len(time) > prof_idx else pd.NaT,
+                    'lat': lat[prof_idx] if len(lat) > prof_idx else np.nan,
+                    'lon': lon[prof_idx] if len(lon) > prof_idx else np.nan,
+                    'pressure': pressure[prof_idx, level_idx],
+                    'temperature': temp[prof_idx, level_idx],
+                    'temp_qc': temp_qc[prof_idx, level_idx],
+                    'salinity': salinity[prof_idx, level_idx],
+                    'salinity_qc': salinity_qc[prof_idx, level_idx],
+                })
+
+    ds.close()
+    return pd.DataFrame.from_records(records)
+
+
+def write_synthetic_prof_file(path, platform, n_prof, n_levels, rng):
+    """Write a minimal ARGO-like profile file with a realistic QC flag mix."""
+    qc_choices = np.array([b'1', b'2', b'3', b'4', b'9'])
+    qc_weights = [0.80, 0.10, 0.04, 0.03, 0.03]
+
+    pres = np.sort(rng.uniform(0, 2000, size=(n_prof, n_levels)), axis=1).astype('float32')
+    temp = (28 - pres / 80 + rng.normal(0, 0.3, size=pres.shape)).astype('float32')
+    psal = (34.5 + pres / 4000 + rng.normal(0, 0.05, size=pres.shape)).astype('float32')
+    juld = np.datetime64('2023-01-01') + np.arange(n_prof) * np.timedelta64(10, 'D')
+
+    ds = xr.Dataset(
+        {
+            'PRES_ADJUSTED': (('N_PROF', 'N_LEVELS'), pres),
+            'TEMP_ADJUSTED': (('N_PROF', 'N_LEVELS'), temp),
+            'TEMP_ADJUSTED_QC': (('N_PROF', 'N_LEVELS'), rng.choice(qc_choices, size=pres.shape, p=qc_weights)),
+            'PSAL_ADJUSTED': (('N_PROF', 'N_LEVELS'), psal),
+            'PSAL_ADJUSTED_QC': (('N_PROF', 'N_LEVELS'), rng.choice(qc_choices, size=pres.shape, p=qc_weights)),
+            'LATITUDE': (('N_PROF',), rng.uniform(-10, 25, n_prof)),
+            'LONGITUDE': (('N_PROF',), rng.uniform(60, 100, n_prof)),
+            'JULD': (('N_PROF',), juld.astype('datetime64[ns]')),
+            'CYCLE_NUMBER': (('N_PROF',), np.arange(1, n_prof + 1, dtype='int32')),
+            'PLATFORM_NUMBER': (('N_PROF',), np.array([str(platform).encode()] * n_prof, dtype='S8')),
+        }
+    )
+    ds.to_netcdf(path)
+
+
+def time_extractor(fn, files):
+    start = time.perf_counter()
+    frames = [fn(f) for f in files]
+    elapsed = time.perf_counter() - start
+    rows = sum(len(df) for df in frames)
+    return frames, rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=5)
+    parser.add_argument('--profiles', type=int, default=200)
+    parser.add_argument('--levels', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f'synthetic_{4900000 + i}_prof.nc')
+            write_synthetic_prof_file(path, 4900000 + i, args.profiles, args.levels, rng)
+            files.append(path)
+
+        print(f'{args.files} files x {args.profiles} profiles x {args.levels} levels')
+
+        legacy_frames, legacy_rows, legacy_s = time_extractor(legacy_process_argo_file, files)
+        print(f'loop:       {legacy_rows:>10d} rows in {legacy_s:7.2f}s  ({legacy_rows / legacy_s:12,.0f} rows/s)')
+
+        vector_frames, vector_rows, vector_s = time_extractor(process_argo_file, files)
+        print(f'vectorized: {vector_rows:>10d} rows in {vector_s:7.2f}s  ({vector_rows / vector_s:12,.0f} rows/s)')
+
+        print(f'speedup:    {legacy_s / vector_s:.1f}x')
+
+        for old, new in zip(legacy_frames, vector_frames):
+            pd.testing.assert_frame_equal(old.reset_index(drop=True), new.reset_index(drop=True), check_dtype=False)
+        print('outputs identical')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,16 @@
+import os
+import sys
+from collections import defaultdict
+
 import pandas as pd
 
+import parquet_store
+
+# Columns the cleaning step and the PostgreSQL staging table actually use
+CLEAN_COLUMNS = ['float_id', 'cycle', 'time', 'lat', 'lon', 'pressure',
+                 'temperature', 'temp_qc', 'salinity', 'salinity_qc']
+
+
 def preprocess_argo_csv(input_path, output_path):
     # Load CSV file
     df = pd.read_csv(input_path)
@@ -21,9 +32,41 @@ def preprocess_argo_csv(input_path, output_path):
     df.to_csv(output_path, index=False)
     print(f"Cleaned CSV saved to {output_path} without 'geom' column for PostgreSQL import.")
 
-# File paths
-input_csv = r'data\processed\argo_profiles_merged.csv'
-output_csv = r'data\processed\argo_profiles_final_cleaned.csv'
 
-# Run preprocessing
-preprocess_argo_csv(input_csv, output_csv)
+def preprocess_argo_parquet(input_dir, output_dir):
+    """Clean a Parquet store one source file at a time, reading only CLEAN_COLUMNS.
+
+    Rows are cleaned per source NetCDF file and written back under the same
+    source name in `output_dir`, so memory use is bounded by the largest file
+    and the output keeps the input's layout and column types.
+    """
+    dataset = parquet_store.dataset(input_dir)
+    by_source = defaultdict(list)
+    for fragment in dataset.get_fragments():
+        by_source[os.path.basename(fragment.path).rsplit('-', 1)[0]].append(fragment)
+
+    cleaned = 0
+    for source, fragments in sorted(by_source.items()):
+        df = pd.concat(
+            [f.to_table(schema=dataset.schema, columns=CLEAN_COLUMNS).to_pandas() for f in fragments],
+            ignore_index=True,
+        )
+        df = df.dropna(subset=['lat', 'lon', 'time'])
+        for qc in ('temp_qc', 'salinity_qc'):
+            df[qc] = df[qc].astype('string').fillna('0')
+
+        parquet_store.write_source(df, output_dir, source)
+        cleaned += len(df)
+    print(f"Cleaned Parquet store saved to {output_dir} ({cleaned} rows).")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and os.path.isdir(sys.argv[1]):
+        preprocess_argo_parquet(sys.argv[1], sys.argv[2])
+    else:
+        # File paths
+        input_csv = r'data\processed\argo_profiles_merged.csv'
+        output_csv = r'data\processed\argo_profiles_final_cleaned.csv'
+
+        # Run preprocessing
+        preprocess_argo_csv(input_csv, output_csv)
@@ -1,16 +1,42 @@
+import argparse
+import os
+
 import pandas as pd
 
-# Load the two CSV files
-df1 = pd.read_csv('data/processed/argo_profiles_cleaned.csv')
-df2 = pd.read_csv('data/processed/argo_profiles_cleaned2.csv')
+import parquet_store
+
+
+def merge_csv(inputs, output):
+    # Load the CSV files and concatenate them vertically (stack rows)
+    merged_df = pd.concat([pd.read_csv(path) for path in inputs], ignore_index=True)
+
+    # Optionally, drop duplicates if needed
+    # merged_df = merged_df.drop_duplicates()
+
+    # Save the merged dataframe to a new CSV file
+    merged_df.to_csv(output, index=False)
+    print(f'CSV files merged successfully and saved as {os.path.basename(output)}')
+
+
+def merge_parquet(inputs, output):
+    # Parquet stores merge by linking their partition files; no rows are read
+    linked = parquet_store.merge(inputs, output)
+    print(f'Linked {linked} Parquet files from {len(inputs)} stores into {output}')
+
 
-# Concatenate the dataframes vertically (stack rows)
-merged_df = pd.concat([df1, df2], ignore_index=True)
+def main():
+    parser = argparse.ArgumentParser(description='Merge processed ARGO profile outputs.')
+    parser.add_argument('inputs', nargs='*', help='CSV files, or Parquet store directories')
+    parser.add_argument('--output', help='Merged CSV file or Parquet store directory')
+    args = parser.parse_args()
 
-# Optionally, drop duplicates if needed
-# merged_df = merged_df.drop_duplicates()
+    inputs = args.inputs or ['data/processed/argo_profiles_cleaned.csv',
+                             'data/processed/argo_profiles_cleaned2.csv']
+    if all(os.path.isdir(path) for path in inputs):
+        merge_parquet(inputs, args.output or 'data/processed/argo_profiles_merged_parquet')
+    else:
+        merge_csv(inputs, args.output or 'data/processed/argo_profiles_merged.csv')
 
-# Save the merged dataframe to a new CSV file
-merged_df.to_csv('data/processed/argo_profiles_merged.csv', index=False)
 
-print('CSV files merged successfully and saved as argo_profiles_merged.csv')
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+scripts/ingest_manifest.py
+
+Persistent record of which raw NetCDF files have already been ingested.
+
+Each entry is keyed by file path and stores size, mtime, a SHA-256 of the
+content and the per-file output ("part") it produced. A file is only hashed
+again when its size or mtime changed, and only reprocessed when the hash
+changed too, so a nightly run costs one stat() per unchanged file.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Return {file_path: entry}; a missing or incompatible manifest means 'nothing ingested yet'."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_manifest(path, entries):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': entries}, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def plan_changes(files, entries):
+    """Split `files` against the manifest.
+
+    Returns (changed, unchanged, removed, fingerprints): `changed` are new or
+    modified paths that must be reprocessed, `unchanged` can be skipped,
+    `removed` are manifest paths no longer on disk, and `fingerprints` maps every
+    current path to its fresh {size, mtime_ns, sha256} (sha256 is None when the
+    stat matched and hashing was skipped).
+    """
+    changed, unchanged, fingerprints = [], [], {}
+    for path in files:
+        st = os.stat(path)
+        fp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': None}
+        old = entries.get(path)
+        if old and old['size'] == fp['size'] and old['mtime_ns'] == fp['mtime_ns']:
+            fp['sha256'] = old['sha256']
+            unchanged.append(path)
+        else:
+            fp['sha256'] = file_sha256(path)
+            # Touched but identical content (e.g. re-downloaded): skip it
+            if old and old['size'] == fp['size'] and old['sha256'] == fp['sha256']:
+                unchanged.append(path)
+            else:
+                changed.append(path)
+        fingerprints[path] = fp
+
+    current = set(files)
+    removed = sorted(path for path in entries if path not in current)
+    return changed, unchanged, removed, fingerprints
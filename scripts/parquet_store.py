@@ -0,0 +1,127 @@
+"""
+scripts/parquet_store.py
+
+Columnar storage for extracted ARGO profile rows.
+
+A store is a directory of Parquet files laid out as
+
+    <root>/float_id=<id>/year=<yyyy>/month=<m>/<source>-<n>.parquet
+
+Measurements are float32 and QC flags are dictionary-encoded, so readers can
+ask for just the columns and partitions they need. Each ingested NetCDF file
+writes its own <source>-*.parquet files, which makes replacing one file's rows
+and merging whole stores a matter of adding or removing files.
+"""
+
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+PARTITION_COLUMNS = ['float_id', 'year', 'month']
+
+SCHEMA = pa.schema([
+    ('float_id', pa.string()),
+    ('cycle', pa.int32()),
+    ('time', pa.timestamp('ns')),
+    ('lat', pa.float64()),
+    ('lon', pa.float64()),
+    ('pressure', pa.float32()),
+    ('temperature', pa.float32()),
+    ('temp_qc', pa.dictionary(pa.int8(), pa.string())),
+    ('salinity', pa.float32()),
+    ('salinity_qc', pa.dictionary(pa.int8(), pa.string())),
+])
+
+PARTITIONING = pads.partitioning(
+    pa.schema([('float_id', pa.string()), ('year', pa.int16()), ('month', pa.int8())]),
+    flavor='hive',
+)
+
+
+def _source_files(root, source):
+    return glob.glob(os.path.join(glob.escape(root), '**', f'{glob.escape(source)}-*.parquet'), recursive=True)
+
+
+def to_table(df):
+    """Cast an extracted DataFrame to the store schema plus year/month partition keys."""
+    df = df.copy()
+    df['time'] = pd.to_datetime(df['time'])
+    df['cycle'] = df['cycle'].astype('Int32')
+    for qc in ('temp_qc', 'salinity_qc'):
+        df[qc] = df[qc].astype('string')
+    table = pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+    year = pc.year(table['time']).cast(pa.int16())
+    month = pc.month(table['time']).cast(pa.int8())
+    return table.append_column('year', year).append_column('month', month)
+
+
+def write_source(df, root, source):
+    """Replace all rows previously written for `source` (e.g. a NetCDF file stem) with `df`."""
+    remove_source(root, source)
+    if df is None or df.empty:
+        return
+    pads.write_dataset(
+        to_table(df),
+        root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f'{source}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+    )
+
+
+def remove_source(root, source):
+    for path in _source_files(root, source):
+        os.remove(path)
+
+
+def dataset(root):
+    return pads.dataset(root, format='parquet', partitioning=PARTITIONING)
+
+
+def read(root, columns=None, filters=None):
+    """Read selected columns of a store into a DataFrame.
+
+    `filters` uses the pyarrow DNF form, e.g. [('float_id', '=', '4903775'),
+    ('year', '=', 2023)]; partition keys in it prune whole directories.
+    """
+    table = pq.read_table(root, columns=columns, filters=filters, partitioning=PARTITIONING)
+    return table.to_pandas()
+
+
+def iter_batches(root, columns=None, filter=None, batch_size=65536):
+    """Yield DataFrames of at most `batch_size` rows without materialising the whole store."""
+    scanner = dataset(root).scanner(columns=columns, filter=filter, batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def merge(sources, dest):
+    """Merge stores into `dest` by linking their files; no row is read or rewritten.
+
+    Files are hard-linked where the filesystem allows it and copied otherwise.
+    Each source's files get a distinct prefix so identical source names in
+    different stores cannot collide.
+    """
+    linked = 0
+    for n, src in enumerate(sources):
+        for path in sorted(glob.glob(os.path.join(glob.escape(src), '**', '*.parquet'), recursive=True)):
+            rel_dir, name = os.path.split(os.path.relpath(path, src))
+            target_dir = os.path.join(dest, rel_dir)
+            os.makedirs(target_dir, exist_ok=True)
+            target = os.path.join(target_dir, f'm{n}_{name}')
+            if os.path.exists(target):
+                os.remove(target)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copy2(path, target)
+            linked += 1
+    return linked
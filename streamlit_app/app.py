@@ -57,14 +57,23 @@ else:
 # ---------------------------
 # SQL query for spatial data
 # ---------------------------
+# Gridded means from map_grid (scripts/map_grid.py): cells of 360 / 2**zoom
+# degrees summed from the stored 1.4 degree grid, so the number of points is
+# bounded by the grid size instead of the number of observations. Depth bands
+# are whole bands, so the depth limit is rounded up to the next band boundary.
+map_zoom = st.sidebar.slider("Map grid detail", 2, 8, 6)
+cell_deg = 360 / 2 ** map_zoom
+shift = 8 - map_zoom
 map_query = f"""
-SELECT lon, lat, AVG(value) as val
-FROM observations
-WHERE variable = '{variable}'
-  AND depth < {depth_limit}
-  AND obs_time BETWEEN '{start_date}' AND '{end_date}'
-GROUP BY lon, lat
-LIMIT 2000;
+SELECT SUM(lon_sum) / SUM(value_count) AS lon,
+       SUM(lat_sum) / SUM(value_count) AS lat,
+       SUM(value_sum) / SUM(value_count) AS val,
+       SUM(value_count) AS n
+FROM map_grid
+WHERE variable = '{"temperature" if variable == "TEMP" else "salinity"}'
+  AND day BETWEEN '{start_date}' AND '{end_date}'
+  AND depth_band IN (SELECT band FROM depth_bands WHERE lower_dbar < {depth_limit})
+GROUP BY cell_x >> {shift}, cell_y >> {shift};
 """
 
 map_df = pd.read_sql(map_query, engine)
@@ -87,9 +96,10 @@ else:
                 data=map_df,
                 get_position='[lon, lat]',
                 get_color='[200, 30, 0, 160]',
-                get_radius=30000,
+                # Half a cell, in metres at the equator
+                get_radius=cell_deg * 111_320 / 2,
                 pickable=True,
             ),
         ],
-        tooltip={"text": f"{variable}: {{val}}"}
+        tooltip={"text": f"{variable}: {{val}} ({{n}} obs)"}
     ))
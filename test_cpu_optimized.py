@@ -1,22 +1,13 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 import os
 
-torch.set_num_threads(min(8, os.cpu_count()))
-
-print("🔄 Loading your fine-tuned ocean chatbot...")
-model = AutoModelForCausalLM.from_pretrained(
-    "./ocean_chatbot_final",
-    dtype=torch.float32,
-    device_map="cpu",
-    low_cpu_mem_usage=True
-)
+from inference_backends import CHAT_BACKEND, load_chat_model
 
-tokenizer = AutoTokenizer.from_pretrained("./ocean_chatbot_final")
+torch.set_num_threads(min(8, os.cpu_count()))
 
-if tokenizer.pad_token is None or tokenizer.pad_token == tokenizer.eos_token:
-    tokenizer.add_special_tokens({"pad_token": "[PAD]"})
-    model.resize_token_embeddings(len(tokenizer))
+# Pick the backend with CHAT_BACKEND=fp32|int8|bf16|compile|onnx (see inference_backends.py)
+print(f"🔄 Loading your fine-tuned ocean chatbot ({CHAT_BACKEND})...")
+model, tokenizer, backend = load_chat_model("./ocean_chatbot_final", CHAT_BACKEND)
 
 def ask_ocean_question(question):
     prompt = f"System: You are an oceanographic data expert that provides accurate information about ocean measurements.\nUser: {question}\nBot:"
@@ -63,7 +54,7 @@ def test_various_questions():
         print(f"A: {answer}")
 
 def main():
-    print("🌊 Ocean Data Chatbot Ready! (Intel CPU Optimized)")
+    print(f"🌊 Ocean Data Chatbot Ready! (Intel CPU Optimized, backend: {backend})")
     print("💡 Type 'test' to run automated tests")
     print("💡 Type 'quit' to exit")
     
@@ -0,0 +1,71 @@
+"""
+Tiny, randomly initialised stand-in for ./ocean_chatbot_final, for CPU
+benchmarks of the chatbot serving code without the real weights.
+
+The tokenizer is a word-level vocabulary built on the spot from the system
+prompt and a handful of ocean questions, so nothing is downloaded; the model
+is a GPT-2 of the requested size. Its answers are noise, but the work per
+token (embedding, attention, sampling loop, padding) has the same shape as
+the real model's, so throughput and latency comparisons carry over.
+
+Usage:
+  from tiny_model import build_tiny_model
+  model, tokenizer = build_tiny_model(layers=2, hidden=128)
+"""
+
+import torch
+from tokenizers import AddedToken, Tokenizer, models, normalizers, pre_tokenizers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+SAMPLE_QUESTIONS = [
+    "What is the ocean temperature?",
+    "What is the salinity?",
+    "What data did ARGO floats collect?",
+    "How deep do the floats go in the Arabian Sea?",
+    "What's the temperature of the ocean near the surface?",
+    "Show salinity below 500 dbar in the Bay of Bengal",
+    "Which float measured the coldest water last month?",
+    "How does pressure change with depth?",
+]
+
+_WORDS = (
+    "system user bot you are an oceanographic data expert that provides accurate information about "
+    "ocean measurements temperature salinity pressure depth float floats argo profile profiles surface "
+    "deep water sea bay of bengal arabian indian what is the how do does which show near below above "
+    "in last month year coldest warmest change with collect collected did go dbar degrees psu"
+)
+
+
+def build_tokenizer(extra_text=""):
+    words = sorted(set(_WORDS.split()) | set(" ".join(SAMPLE_QUESTIONS + [extra_text]).lower().split()))
+    vocab = {token: i for i, token in enumerate(["[UNK]", "[PAD]", "<eos>", ":", "?", ".", ",", "'"] + words)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    backend.normalizer = normalizers.Lowercase()
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    # Role markers stay whole so decoded text still contains "Bot:" for the server to split on
+    backend.add_tokens([AddedToken(marker, normalized=False) for marker in ("System:", "User:", "Bot:")])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="[UNK]", pad_token="[PAD]", eos_token="<eos>"
+    )
+    tokenizer.padding_side = "left"
+    return tokenizer
+
+
+def build_tiny_model(layers=2, hidden=128, heads=4, seed=0):
+    """(model, tokenizer) with random weights, in eval mode on the CPU."""
+    torch.manual_seed(seed)
+    tokenizer = build_tokenizer()
+    config = GPT2Config(
+        vocab_size=len(tokenizer),
+        n_positions=512,
+        n_embd=hidden,
+        n_layer=layers,
+        n_head=heads,
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=tokenizer.pad_token_id,
+        # Tied random embeddings make greedy decoding echo the last prompt token forever
+        tie_word_embeddings=False,
+    )
+    model = GPT2LMHeadModel(config).eval()
+    return model, tokenizer